@@ -151,6 +151,8 @@ router.post("/interactions", requireAuth(), async (req, res) => {
           product_id: productId,
           action: action,
           reward: reward,
+          interaction_id: interaction.id,
+          created_at: interaction.createdAt,
         },
         {
           headers: {
@@ -4,11 +4,15 @@ import asyncio
 import httpx
 import os
 import sys
+import threading
+import time
 import uvicorn
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 from typing import List, Dict, Any, Optional
 import logging
+import logging.handlers
+import queue
 from contextlib import asynccontextmanager
 from pydantic import BaseModel, ValidationError
 # Import the simplified recommendation system
@@ -16,6 +20,7 @@ from models.simplified import (
     SimplifiedRecommendationSystem,
     Product,
     UserInteraction,
+    InteractionBatch,
     create_product_from_dict,
     create_interaction_from_dict
 )
@@ -24,19 +29,97 @@ from models.simplified import (
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO" if ENVIRONMENT == "production" else "DEBUG")
 
+LOG_FLUSH_INTERVAL = 0.05  # Seconds a log record may wait in the queue before being written
+LOG_FLUSH_RECORDS = 100    # Maximum number of log records written together
+
+
+class BatchingLogListener:
+    """
+    Drains a log record queue on a background thread and writes the records through a
+    StreamHandler in batches: up to LOG_FLUSH_RECORDS records, collected for at most
+    LOG_FLUSH_INTERVAL after the first one arrives, go out in one write and one flush.
+    """
+
+    def __init__(self, log_queue: "queue.SimpleQueue[Optional[logging.LogRecord]]",
+                 handler: logging.StreamHandler):
+        self.queue = log_queue
+        self.handler = handler
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._monitor, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write every queued record, then stop the thread."""
+        if self._thread is not None:
+            self.queue.put(None)  # Sentinel: nothing is enqueued after it
+            self._thread.join()
+            self._thread = None
+
+    def _monitor(self) -> None:
+        stopping = False
+        while not stopping:
+            record = self.queue.get()
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            batch = []
+            while record is not None:
+                batch.append(record)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= LOG_FLUSH_RECORDS or remaining <= 0:
+                    break
+                try:
+                    record = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            stopping = record is None
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        handler = self.handler
+        lines = []
+        for record in batch:
+            try:
+                lines.append(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        if not lines:
+            return
+        with handler.lock:
+            try:
+                handler.stream.write("".join(lines))
+                handler.stream.flush()
+            except Exception:
+                handler.handleError(batch[-1])
+
+
+# Request handlers only enqueue log records; a listener thread formats and writes them
+# to stdout in batches, so console I/O never blocks the event loop
+log_stream_handler = logging.StreamHandler(sys.stdout)
+log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_queue: "queue.SimpleQueue[Optional[logging.LogRecord]]" = queue.SimpleQueue()
+log_listener = BatchingLogListener(log_queue, log_stream_handler)
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Only merge args; the listener formats
+
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
+        log_queue_handler
+    ],
+    force=True  # Take over the root logger even if it was configured before this module was imported
 )
+log_listener.start()
 logger = logging.getLogger(__name__)
 class FeedbackRequest(BaseModel):
     user_id: str
     product_id: str
     action: str
+    # Id of the stored interaction record, so that syncing it later does not count it twice
+    interaction_id: str
     reward: Optional[float] = None
+    created_at: Optional[str] = None  # createdAt of the stored record, if known
 
 # Configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:3000")
@@ -44,6 +127,16 @@ MAX_INIT_RETRIES = int(os.getenv("MAX_INIT_RETRIES", "10"))  # Maximum number of
 INIT_RETRY_DELAY = int(os.getenv("INIT_RETRY_DELAY", "5"))  # Initial delay in seconds between retries
 MAX_RETRY_DELAY = int(os.getenv("MAX_RETRY_DELAY", "60"))  # Maximum delay between retries
 
+# Default reward per feedback action, used when a feedback request carries no reward
+ACTION_REWARDS = {
+    'tick': 1.0,
+    'cross': -0.5,
+    'view': 0.1,
+    'cart_add': 0.8,
+    'purchase': 2.0,
+    'ar_view': 0.3
+}
+
 # CORS Configuration
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",") if ENVIRONMENT == "production" else ["*"]
 
@@ -165,18 +258,11 @@ async def load_all_interactions():
             data = response.json()
             interactions_data = data.get("interactions", [])
             
-            # Convert to UserInteraction objects
-            all_interactions = []
-            for interaction_data in interactions_data:
-                try:
-                    interaction = create_interaction_from_dict(interaction_data)
-                    all_interactions.append(interaction)
-                except Exception as e:
-                    logger.error(f"Error creating interaction from data: {e}")
-                    continue
+            # Convert to columns in one pass; training reads no per-interaction objects
+            all_interactions = InteractionBatch.from_dicts(interactions_data)
             
-            if all_interactions:
-                system.update_from_interactions(all_interactions)
+            if len(all_interactions):
+                system.rebuild_from_interactions(all_interactions)
                 logger.info(f"Trained recommendation system with {len(all_interactions)} interactions")
             else:
                 logger.info("No interactions found - system ready for new users")
@@ -196,9 +282,10 @@ async def get_user_interactions(user_id: str) -> List[UserInteraction]:
             
             # Convert to UserInteraction objects
             user_interactions = []
+            product_cache: Dict[str, Product] = {}  # Nested products repeat across interactions
             for interaction_data in interactions:
                 try:
-                    interaction = create_interaction_from_dict(interaction_data)
+                    interaction = create_interaction_from_dict(interaction_data, product_cache)
                     user_interactions.append(interaction)
                 except Exception as e:
                     logger.error(f"Error creating interaction from data: {e}")
@@ -259,6 +346,7 @@ async def lifespan(app: FastAPI):
             await initialization_task
         except asyncio.CancelledError:
             pass
+    log_listener.stop()  # Flush queued log records
 
 # FastAPI app initialization
 app = FastAPI(
@@ -448,26 +536,16 @@ async def record_user_feedback(request: FeedbackRequest):
     Record user feedback (tick/cross) for real-time learning
     This endpoint allows immediate updates without waiting for database sync
     """
-    print(f"Received request: {request}")
-    print(f"user_id: {request.user_id}")
-    print(f"product_id: {request.product_id}")
-    print(f"action: {request.action}")
-    print(f"reward: {request.reward}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received feedback: user_id=%s product_id=%s action=%s reward=%s",
+                     request.user_id, request.product_id, request.action, request.reward)
     global recommendation_system
     
     system = get_recommendation_system()
     
     # Calculate reward if not provided
     if request.reward is None:
-        reward_mapping = {
-            'tick': 1.0,
-            'cross': -0.5,
-            'view': 0.1,
-            'cart_add': 0.8,
-            'purchase': 2.0,
-            'ar_view': 0.3
-        }
-        reward = reward_mapping.get(request.action, 0.0)
+        reward = ACTION_REWARDS.get(request.action, 0.0)
     else:
         reward = request.reward
     
@@ -477,15 +555,17 @@ async def record_user_feedback(request: FeedbackRequest):
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        # Create interaction object
+        # Create interaction object under the stored record's id
         interaction = UserInteraction(
-            id=f"realtime_{request.user_id}_{request.product_id}_{int(datetime.now().timestamp())}",
+            id=request.interaction_id,
             userId=request.user_id,
             productId=request.product_id,
             action=request.action,
             reward=reward,
             context={"source": "realtime_feedback"},
-            createdAt=datetime.now().isoformat(),
+            # Same format as the backend's timestamps (JavaScript toISOString), so they compare in order
+            createdAt=(request.created_at
+                       or datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')),
             product=product
         )
         
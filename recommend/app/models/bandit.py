@@ -9,16 +9,35 @@ import math
 from abc import ABC, abstractmethod
 from typing import List, Dict, Tuple, Optional, Any, Union,Set
 import json
+import hashlib
 import logging
+import sys
+import os
+import time
+from collections import Counter, OrderedDict
 from dataclasses import dataclass
 from datetime import datetime
+from operator import itemgetter
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+from .utils import InteractionLedger, exclusion_mask
+
+# Logging is configured by the embedding application; this module only emits records
 logger = logging.getLogger(__name__)
 
+# Last formatted timestamp, reused for up to a second to skip per-response formatting
+_TS_CACHE = [0.0, ""]
+
+
+def _fast_iso_now() -> str:
+    """Return the current local time in ISO format at one-second resolution."""
+    t = time.time()
+    if t - _TS_CACHE[0] >= 1.0:
+        _TS_CACHE[0] = t
+        _TS_CACHE[1] = datetime.fromtimestamp(t).isoformat()
+    return _TS_CACHE[1]
+
 
-@dataclass
+@dataclass(slots=True)
 class ProductFeatures:
     """Product features for content-based recommendations"""
     avg_rating: float
@@ -30,7 +49,7 @@ class ProductFeatures:
     lifecycle_stage: str  # New/Growing/Mature/Declining
 
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     """Product information from database"""
     id: str
@@ -43,7 +62,7 @@ class Product:
     features: Optional[ProductFeatures] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class UserInteraction:
     """User interaction data from database"""
     id: str
@@ -63,111 +82,293 @@ class ColdStartRecommender:
     Simplified to focus on core scoring and filtering.
     """
 
-    def __init__(self, products: List[Product]):
+    # Bumped whenever the layout or meaning of the files written by save_cache changes
+    _CACHE_VERSION = 1
+    # Precomputed column arrays persisted by save_cache, one .npy file each
+    _CACHED_ARRAYS = ('_scores', '_prices', '_has_features', '_cat_codes', '_market_codes',
+                      '_trend_momentum', '_lifecycle_codes', '_is_emerging', '_sorted_idx',
+                      '_price_order', '_sorted_prices')
+    # Score bonus per lifecycle stage; unknown stages get 0.5
+    _LIFECYCLE_BONUSES = {'New': 0.9, 'Growing': 0.8, 'Mature': 0.6, 'Declining': 0.3}
+
+    def __init__(self, products: List[Product], cache_path: Optional[str] = None):
         """
         Initialize cold start recommender.
 
         Args:
             products: List of Product objects with features
+            cache_path: Optional directory for save_cache. Its arrays are memory-mapped instead of
+                        rescoring the catalog when they were built from the same products;
+                        otherwise the catalog is scored and the directory rewritten.
         """
         self.products = {p.id: p for p in products}
+        self._product_list = list(self.products.values())
+        self._product_index = {pid: i for i, pid in enumerate(self.products)}
         self._feature_cache = {}
-        self._prepare_feature_cache()
+        self._rng = np.random.default_rng()
+        self._category_masks: Dict[int, np.ndarray] = {} # Filled lazily per requested category code
+        self._market_masks: Dict[int, np.ndarray] = {}   # Likewise per market position code
+        if cache_path and self._load_cache(cache_path):
+            logger.info(f"Loaded cold start scoring table from {cache_path}")
+        else:
+            self._prepare_feature_cache()
+            if cache_path:
+                self.save_cache(cache_path)
+
+    def _catalog_fingerprint(self) -> str:
+        """
+        Hash of the product fields the scoring table is built from, used to detect a stale table.
+        Fields are hashed as packed columns, which is far cheaper than formatting every product.
+        """
+        products = self._product_list
+        features = [p.features for p in products]
+        numeric = np.array(
+            [(f.avg_rating, f.review_count, f.price_competitiveness, f.days_since_launch, f.trend_momentum)
+             if f else (np.nan,) * 5 for f in features],
+            dtype=np.float64
+        )
+        digest = hashlib.blake2b(digest_size=16)
+        for column in ([p.id for p in products], [p.category for p in products],
+                       [f.market_position if f else '' for f in features],
+                       [f.lifecycle_stage if f else '' for f in features]):
+            digest.update('\0'.join(column).encode())
+            digest.update(b'\1')
+        digest.update(np.array([p.price for p in products], dtype=np.float64).tobytes())
+        digest.update(numeric.tobytes())
+        return digest.hexdigest()
+
+    def save_cache(self, path: str) -> None:
+        """
+        Persist the precomputed scoring table to a directory of .npy files, so that
+        worker processes can memory-map one shared page-cache copy on startup.
+        Failures are logged rather than raised, since the table can always be rebuilt.
+        """
+        if not self.products:
+            return
+        meta = {
+            'version': self._CACHE_VERSION,
+            'fingerprint': self._catalog_fingerprint(),
+            'rating_stats': self.rating_stats,
+            'review_count_stats': self.review_count_stats,
+            'launch_stats': self.launch_stats,
+            'category_vocab': self._category_vocab,
+            'market_vocab': self._market_vocab,
+            'lifecycle_vocab': self._lifecycle_vocab
+        }
+        meta_path = os.path.join(path, 'meta.json')
+        try:
+            os.makedirs(path, exist_ok=True)
+            # Metadata is removed first and written last, so a partially written cache is never
+            # considered valid; every file is swapped in whole so readers never see a torn file
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            for name in self._CACHED_ARRAYS:
+                self._write_atomic(os.path.join(path, f"{name.lstrip('_')}.npy"),
+                                   lambda f, array=getattr(self, name): np.save(f, array))
+            self._write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+        except OSError as e:
+            logger.warning(f"Could not save cold start cache to {path}: {e}")
+
+    @staticmethod
+    def _write_atomic(path: str, write) -> None:
+        """Write a file through a temporary sibling that then replaces it in one rename."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _load_cache(self, path: str) -> bool:
+        """Memory-map a scoring table written by save_cache; returns False if missing or stale."""
+        meta_path = os.path.join(path, 'meta.json')
+        if not self.products or not os.path.exists(meta_path):
+            return False
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get('version') != self._CACHE_VERSION or meta['fingerprint'] != self._catalog_fingerprint():
+                logger.info(f"Cold start cache at {path} is stale, rescoring products.")
+                return False
+            for name in self._CACHED_ARRAYS:
+                setattr(self, name, np.load(os.path.join(path, f"{name.lstrip('_')}.npy"), mmap_mode='r'))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load cold start cache from {path}: {e}")
+            return False
+
+        self.rating_stats = meta['rating_stats']
+        self.review_count_stats = meta['review_count_stats']
+        self.launch_stats = meta['launch_stats']
+        self._category_vocab = meta['category_vocab']
+        self._market_vocab = meta['market_vocab']
+        self._lifecycle_vocab = meta['lifecycle_vocab']
+        self._feature_cache = dict(zip(self.products, self._scores.tolist()))
+        return True
 
     def _prepare_feature_cache(self):
         """Pre-calculate normalized features and scores for all products."""
         if not self.products:
             return
 
-        # Calculate normalization parameters for features
-        ratings = [p.features.avg_rating for p in self.products.values() if p.features]
-        review_counts = [p.features.review_count for p in self.products.values() if p.features]
-        days_since_launch = [p.features.days_since_launch for p in self.products.values() if p.features]
+        products = self._product_list
+        features = [p.features for p in products]
+
+        # Column arrays (one entry per product, in self._product_list order) so that scoring
+        # and request-time filtering are a handful of vectorized operations
+        self._has_features = np.array([f is not None for f in features], dtype=bool)
+        # Numeric features are gathered in one pass over the products and transposed into columns
+        _no_features = (0.0, 0.0, 0.0, 0.0, 0.0)
+        ratings, review_counts, price_competitiveness, days_since_launch, self._trend_momentum = np.array(
+            [(f.avg_rating, f.review_count, f.price_competitiveness, f.days_since_launch, f.trend_momentum)
+             if f else _no_features for f in features],
+            dtype=np.float64
+        ).reshape(-1, 5).T.copy()
+        self._prices = np.array([p.price for p in products], dtype=np.float64)
+        # Lowercased category / market position interned to int32 codes so filters compare integers
+        self._category_vocab, self._cat_codes = self._encode([p.category.lower() for p in products])
+        self._market_vocab, self._market_codes = self._encode(
+            [f.market_position.lower() if f else None for f in features])
+        self._lifecycle_vocab, self._lifecycle_codes = self._encode(
+            [f.lifecycle_stage if f else None for f in features])
+        emerging_codes = [self._lifecycle_vocab[stage] for stage in ('New', 'Growing') if stage in self._lifecycle_vocab]
+        self._is_emerging = np.isin(self._lifecycle_codes, emerging_codes)
 
-        self.rating_stats = {'min': min(ratings) if ratings else 0, 'max': max(ratings) if ratings else 5}
-        self.review_count_stats = {'max': max(review_counts) if review_counts else 100}
-        self.launch_stats = {'max': max(days_since_launch) if days_since_launch else 365}
+        # Calculate normalization parameters for features
+        has = self._has_features
+        self.rating_stats = {'min': float(ratings[has].min()) if has.any() else 0,
+                             'max': float(ratings[has].max()) if has.any() else 5}
+        self.review_count_stats = {'max': int(review_counts[has].max()) if has.any() else 100}
+        self.launch_stats = {'max': int(days_since_launch[has].max()) if has.any() else 365}
 
         # Pre-calculate scores for all products
-        for product_id, product in self.products.items():
-            self._feature_cache[product_id] = self._calculate_product_score(product)
-
-    def _calculate_product_score(self, product: Product) -> float:
+        self._scores = self._score_all(ratings, review_counts, price_competitiveness, days_since_launch)
+        self._feature_cache = dict(zip(self.products, self._scores.tolist()))
+
+        # Score order is fixed after init; requests only walk it and re-jitter near ties
+        self._sorted_idx = np.argsort(-self._scores, kind='stable')
+        # Price order for binary-searching price ranges
+        self._price_order = np.argsort(self._prices, kind='stable')
+        self._sorted_prices = self._prices[self._price_order]
+
+    def _available_mask(self, exclude_products: Optional[List[str]] = None) -> np.ndarray:
+        """Boolean mask over self._product_list that is False for excluded products."""
+        return exclusion_mask(self._product_index, len(self._product_list), exclude_products)
+
+    def _category_mask(self, category: str) -> np.ndarray:
+        """Cached boolean mask of the products in a (case-insensitive) category."""
+        code = self._category_vocab.get(category.lower(), -1)
+        mask = self._category_masks.get(code)
+        if mask is None:
+            mask = self._category_masks[code] = self._cat_codes == code
+        return mask
+
+    def _market_mask(self, market_position: str) -> np.ndarray:
         """
-        Calculate content-based score for a product.
-        Combines various features into a single score.
+        Cached boolean mask of the products in a (case-insensitive) market position.
+        Products without features are not filtered out by market position.
         """
-        if not product.features:
-            return 0.5  # Default score for products without features
-
-        features = product.features
-        score = 0.0
-
-        # Avg Rating (normalized)
-        if self.rating_stats['max'] > self.rating_stats['min']:
-            score += (features.avg_rating - self.rating_stats['min']) / \
-                     (self.rating_stats['max'] - self.rating_stats['min']) * 0.25
-        else:
-            score += 0.8 * 0.25 # Default if no range
-
-        # Review Count (logarithmic)
-        if features.review_count > 0 and self.review_count_stats['max'] > 0:
-            score += math.log(1 + features.review_count) / \
-                     math.log(1 + self.review_count_stats['max']) * 0.15
-
-        # Price Competitiveness
-        score += features.price_competitiveness * 0.20
-
-        # Trend Momentum (normalize from -1,1 to 0,1)
-        score += ((features.trend_momentum + 1) / 2) * 0.15
-
-        # Freshness (simple tiers)
-        if features.days_since_launch <= 30:
-            score += 1.0 * 0.10
-        elif features.days_since_launch <= 90:
-            score += 0.8 * 0.10
-        elif features.days_since_launch <= 180:
-            score += 0.6 * 0.10
-        else:
-            score += 0.4 * 0.10
-
-        # Lifecycle Stage Bonus
-        lifecycle_bonuses = {'New': 0.9, 'Growing': 0.8, 'Mature': 0.6, 'Declining': 0.3}
-        score += lifecycle_bonuses.get(features.lifecycle_stage, 0.5) * 0.15
-
-        return max(0, min(1, score)) # Ensure score is between 0 and 1
+        code = self._market_vocab.get(market_position.lower(), -1)
+        mask = self._market_masks.get(code)
+        if mask is None:
+            mask = self._market_masks[code] = (self._market_codes == code) | ~self._has_features
+        return mask
+
+    def _price_mask(self, low: float, high: float) -> np.ndarray:
+        """Boolean mask of the products priced within [low, high], found by binary search."""
+        mask = np.zeros(len(self._product_list), dtype=bool)
+        start = np.searchsorted(self._sorted_prices, low, side='left')
+        end = np.searchsorted(self._sorted_prices, high, side='right')
+        mask[self._price_order[start:end]] = True
+        return mask
+
+    @staticmethod
+    def _encode(values: List[Optional[str]]) -> Tuple[Dict[str, int], np.ndarray]:
+        """Intern strings to small integer codes; None is encoded as -1."""
+        vocab: Dict[str, int] = {}
+        codes = np.fromiter((-1 if v is None else vocab.setdefault(v, len(vocab)) for v in values),
+                            dtype=np.int32, count=len(values))
+        return vocab, codes
+
+    def _score_all(self, ratings: np.ndarray, review_counts: np.ndarray,
+                   price_competitiveness: np.ndarray, days_since_launch: np.ndarray) -> np.ndarray:
+        """
+        Calculate content-based scores for all products in one vectorized pass.
+        Combines various features into a single score per product.
+        """
+        # Normalization parameters are fixed once the catalog is loaded, so every weight and
+        # constant offset is folded into a scalar or a lookup table before touching the arrays
+        rating_range = self.rating_stats['max'] - self.rating_stats['min']
+        rating_scale = 0.25 / rating_range if rating_range > 0 else 0.0
+        review_scale = (0.15 / math.log1p(self.review_count_stats['max'])
+                        if self.review_count_stats['max'] > 0 else 0.0)
+        # Rating offset (or 0.8 default if no range) plus the +1 shift of trend momentum
+        offset = (-self.rating_stats['min'] * rating_scale if rating_range > 0 else 0.8 * 0.25) + 0.15 / 2
+        # Freshness tiers: <=30, <=90, <=180 and older days since launch
+        freshness_lut = np.array([1.0, 0.8, 0.6, 0.4]) * 0.10
+        # Lifecycle Stage Bonus by interned code (the trailing entry serves code -1)
+        lifecycle_lut = np.array([self._LIFECYCLE_BONUSES.get(stage, 0.5)
+                                  for stage in self._lifecycle_vocab] + [0.5]) * 0.15
+
+        scores = ratings * rating_scale # Avg Rating (normalized)
+        scores += offset
+        if review_scale:
+            scores += np.log1p(np.maximum(review_counts, 0)) * review_scale # Review Count (logarithmic)
+        scores += price_competitiveness * 0.20 # Price Competitiveness
+        scores += self._trend_momentum * (0.15 / 2) # Trend Momentum (normalize from -1,1 to 0,1)
+        scores += np.take(freshness_lut, np.searchsorted([30, 90, 180], days_since_launch, side='left'))
+        scores += np.take(lifecycle_lut, self._lifecycle_codes)
+
+        np.clip(scores, 0, 1, out=scores) # Ensure score is between 0 and 1
+        scores[~self._has_features] = 0.5  # Default score for products without features
+        return scores
 
     def get_cold_start_recommendations(self,
                                      category_filter: Optional[str] = None,
                                      price_range: Optional[Tuple[float, float]] = None,
                                      market_position: Optional[str] = None,
-                                     exclude_products: Optional[List[str]] = None) -> List[Product]:
+                                     exclude_products: Optional[List[str]] = None,
+                                     n_products: Optional[int] = None) -> List[Product]:
         """
         Get recommendations for new users based on product features, with optional filters.
+        Returns every matching product unless n_products is given.
         """
-        exclude_products = exclude_products or []
-        
-        filtered_products = []
-        for product in self.products.values():
-            if product.id in exclude_products:
-                continue
-            if category_filter and product.category.lower() != category_filter.lower():
-                continue
-            if price_range and not (price_range[0] <= product.price <= price_range[1]):
-                continue
-            if (market_position and product.features and
-                product.features.market_position.lower() != market_position.lower()):
-                continue
-            filtered_products.append(product)
-
-        if not filtered_products: # Fallback if filters yield no products
-            filtered_products = [p for p in self.products.values() if p.id not in exclude_products]
-            
-        product_scores = [(product, self._feature_cache.get(product.id, 0.0)) for product in filtered_products]
-        product_scores.sort(key=lambda x: x[1] + np.random.normal(0, 0.01), reverse=True) # Add minor randomness
-        
-        logger.info(f"Cold start: recommended {len(product_scores)} products from {len(filtered_products)} candidates")
-        return [p for p, _ in product_scores]
+        if not self._product_list:
+            return []
+
+        if not (category_filter or price_range or market_position or exclude_products):
+            # Unfiltered request: the memoized score order is the candidate list as is
+            idx = self._sorted_idx
+        else:
+            available = self._available_mask(exclude_products)
+            mask = available.copy()
+            if category_filter:
+                # Unknown values map to -1, which no product with that attribute carries
+                mask &= self._category_mask(category_filter)
+            if price_range:
+                mask &= self._price_mask(*price_range)
+            if market_position:
+                mask &= self._market_mask(market_position)
+
+            # Walk the precomputed score order, so candidates are already ranked by score
+            idx = self._sorted_idx[mask[self._sorted_idx]]
+            if idx.size == 0: # Fallback if filters yield no products
+                idx = self._sorted_idx[available[self._sorted_idx]]
+
+        # Noise only swaps near-ties, so jittering the top 2n is enough when n is known
+        candidates = idx if n_products is None else idx[:2 * n_products]
+        # Add minor randomness: one batched draw, with scores added into the noise buffer in place
+        noisy = self._rng.normal(0, 0.01, candidates.size)
+        noisy += self._scores[candidates]
+        # Input is nearly sorted already, which the stable (timsort) path handles in ~linear time
+        order = candidates[np.argsort(-noisy, kind='stable')]
+        if n_products is not None:
+            order = order[:n_products]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Cold start: recommended %d products from %d candidates", len(order), idx.size)
+        return [self._product_list[i] for i in order]
 
     def get_trending_products(self, n_products: int = 5,
                             min_trend_momentum: float = 0.3,
@@ -175,36 +376,28 @@ class ColdStartRecommender:
         """
         Get trending products based on trend momentum and lifecycle stage.
         """
-        exclude_products = exclude_products or []
-        trending_candidates = []
-
-        for product in self.products.values():
-            if product.id in exclude_products or not product.features:
-                continue
-            if product.features.trend_momentum >= min_trend_momentum and \
-               product.features.lifecycle_stage in ['New', 'Growing']:
-                trending_candidates.append(product)
-        
-        if not trending_candidates: # Fallback to any positive trend if no strong trends
-            trending_candidates = [
-                p for p in self.products.values()
-                if (p.id not in exclude_products and p.features and
-                    p.features.trend_momentum > 0)
-            ]
-
-        trending_scored = []
-        for product in trending_candidates:
-            base_score = self._feature_cache.get(product.id, 0.0)
-            # Boost for trending specific features
-            trend_bonus = product.features.trend_momentum * 0.3 # type: ignore
-            lifecycle_bonus = 0.2 if product.features.lifecycle_stage in ['New', 'Growing'] else 0 # type: ignore
-            final_score = base_score + trend_bonus + lifecycle_bonus
-            trending_scored.append((product, final_score))
-
-        trending_scored.sort(key=lambda x: x[1], reverse=True)
-        
-        logger.info(f"Trending recommendations: {len(trending_scored[:n_products])} products")
-        return [p for p, _ in trending_scored[:n_products]]
+        if not self._product_list:
+            return []
+
+        available = self._available_mask(exclude_products) & self._has_features
+        mask = available & (self._trend_momentum >= min_trend_momentum) & self._is_emerging
+        if not mask.any(): # Fallback to any positive trend if no strong trends
+            mask = available & (self._trend_momentum > 0)
+
+        idx = np.flatnonzero(mask)
+        # Boost for trending specific features
+        final_scores = self._scores[idx] + self._trend_momentum[idx] * 0.3 + self._is_emerging[idx] * 0.2
+
+        # Partial selection of the top n, then order only those
+        if n_products < idx.size:
+            top = np.argpartition(-final_scores, n_products - 1)[:n_products]
+        else:
+            top = np.arange(idx.size)
+        top = top[np.argsort(-final_scores[top], kind='stable')]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Trending recommendations: %d products", top.size)
+        return [self._product_list[i] for i in idx[top]]
 
 
 class ProductScorer:
@@ -215,9 +408,9 @@ class ProductScorer:
     def score_product(cls, product_id: str, interactions: List[UserInteraction]) -> float:
         """
         Calculate overall score for a product based on interactions.
+        Bandits aggregate whole interaction batches themselves (see MultiArmedBandit.update_rewards).
         """
-        product_interactions = [i for i in interactions if i.productId == product_id]
-        return sum(interaction.reward for interaction in product_interactions) if product_interactions else 0.0
+        return sum((interaction.reward for interaction in interactions if interaction.productId == product_id), 0.0)
 
 
 class MultiArmedBandit(ABC):
@@ -228,103 +421,207 @@ class MultiArmedBandit(ABC):
     def __init__(self, products: List[Product]):
         self.products = {p.id: p for p in products}
         self.product_ids = list(self.products.keys())
+        self._arm_products = list(self.products.values()) # Product per arm index, built once
         self.n_arms = len(self.product_ids)
         if self.n_arms == 0:
             raise ValueError("Cannot create bandit with no products")
 
-        self.counts = np.zeros(self.n_arms)  # Number of times each product was recommended
-        self.rewards = np.zeros(self.n_arms)  # Sum of rewards for each product
+        # float32 state halves memory traffic for the vectorized scoring passes. Counts stay
+        # floating point (exact up to 2**24 per arm) so divisions and reciprocals need no casts.
+        self.counts = np.zeros(self.n_arms, dtype=np.float32)  # Number of times each product was recommended
+        self.rewards = np.zeros(self.n_arms, dtype=np.float32)  # Sum of rewards for each product
         self.total_pulls = 0
         self.product_to_arm = {pid: i for i, pid in enumerate(self.product_ids)}
+        self._ledger = InteractionLedger() # Which stored interactions the statistics already count
+        self._rng = np.random.default_rng() # Per-bandit PCG64 generator, no shared global RandomState
+        # Uniform draws for scalar decisions are taken from a block refilled every 1024 uses
+        self._rand_buf: List[float] = []
+        self._rand_idx = 0
+        # Scratch buffers reused by every scoring pass, so steady-state scoring allocates nothing
+        self._score_buf = np.empty(self.n_arms, dtype=np.float32)
+        self._aux_buf = np.empty(self.n_arms, dtype=np.float32)
+        self._mask_buf = np.empty(self.n_arms, dtype=bool)
 
     @abstractmethod
     def select_arm(self) -> int:
         """Select which arm to pull next."""
         pass
 
-    def select_products(self, n_products: int = 5, exclude_products: Optional[List[str]] = None) -> List[Product]:
+    @abstractmethod
+    def score_arms(self, mask: np.ndarray) -> np.ndarray:
         """
-        Select multiple products for recommendation ensuring diversity.
+        Score every arm for ranking in a single vectorized pass.
+        Arms outside the boolean mask must be scored as -inf.
+        May return a reused scratch buffer, valid until the next scoring call.
         """
-        # Initialize exclude_products as a set for efficient lookups and additions
-        # Use a type hint for clarity
-        current_exclude_products: Set[str] = set(exclude_products or [])
-        recommended_product_ids = []
-
-        # available_arms_indices will be a list of original indices
-        available_arms_indices = [i for i, pid in enumerate(self.product_ids) if pid not in current_exclude_products]
-
-        if not available_arms_indices:
-            logger.warning("No products available after exclusions for bandit selection.")
-            return []
-
-        # Determine how many products to actually select, up to n_products or available
-        num_to_select =  len(available_arms_indices)
-
-        for _ in range(num_to_select):
-            if not available_arms_indices: # Check if still available arms after previous selections
-                break
-
-            # Create a temporary bandit for the current selection round
-            # This temporary bandit only considers the currently available arms
-            temp_bandit = type(self)(
-                products=[self.products[self.product_ids[i]] for i in available_arms_indices]
-            )
+        pass
 
-            # Map the counts    and rewards to the temporary bandit's arms
-            temp_bandit.counts = [self.counts[i] for i in available_arms_indices]
-            temp_bandit.rewards = [self.rewards[i] for i in available_arms_indices]
-            temp_bandit.total_pulls = self.total_pulls # total pulls is global
+    def _next_rand(self) -> float:
+        """Next uniform draw in [0, 1), served from a pre-drawn block."""
+        if self._rand_idx >= len(self._rand_buf):
+            self._rand_buf = self._rng.random(1024).tolist()
+            self._rand_idx = 0
+        u = self._rand_buf[self._rand_idx]
+        self._rand_idx += 1
+        return u
+
+    def _random_arm(self) -> int:
+        """Uniformly random arm index."""
+        return min(int(self._next_rand() * self.n_arms), self.n_arms - 1)
+
+    def _mask_out(self, scores: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Set scores outside mask to -inf in place and return them."""
+        scores[np.logical_not(mask, out=self._mask_buf)] = -np.inf
+        return scores
+
+    def _rank_arms(self, mask: np.ndarray, k: int, scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Return the indices of the k best-scoring arms within mask, best first.
+        Ties (e.g. several unpulled arms) are broken randomly.
+        Precomputed unmasked scores may be passed to reuse them across requests.
+        """
+        scores = self.score_arms(mask) if scores is None else np.where(mask, scores, -np.inf)
+        if k < self.n_arms:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            # argpartition settles ties at the k-th score by position; when more arms share it
+            # (e.g. unpulled UCB arms, all +inf) than fit, draw the tied slots at random instead
+            kth = scores[candidates].min()
+            tied = np.flatnonzero(scores == kth)
+            above = candidates[scores[candidates] > kth]
+            if len(tied) > k - len(above):
+                candidates = np.concatenate([above, self._rng.choice(tied, k - len(above), replace=False)])
+        else:
+            candidates = np.arange(self.n_arms)
+        # Random keys only for the k candidates, not for every arm
+        order = np.lexsort((self._rng.random(len(candidates)), -scores[candidates]))
+        return candidates[order]
 
-            # Select an arm from the temporary bandit
-            selected_temp_arm_idx = temp_bandit.select_arm()
-            
-            if selected_temp_arm_idx == -1: # No arm could be selected by temp_bandit
-                break
+    def _available_mask(self, exclude_products: Optional[List[str]] = None) -> np.ndarray:
+        """Boolean mask over arms that is False for excluded (and already selected) products."""
+        return exclusion_mask(self.product_to_arm, self.n_arms, exclude_products)
 
-            # Map the selected temporary arm index back to the original arm index
-            original_arm_idx = available_arms_indices[selected_temp_arm_idx]
-            selected_product_id = self.product_ids[original_arm_idx]
+    def shared_scores(self) -> Optional[np.ndarray]:
+        """
+        Unmasked arm scores that several requests served from the current state can
+        share (see the scores argument of select_products), or None if every request
+        has to score the arms itself.
+        """
+        return self.score_arms(np.ones(self.n_arms, dtype=bool)).copy()
 
-            recommended_product_ids.append(selected_product_id)
-            
-            # Exclude the selected product from future considerations in this selection process
-            # Use .add() for sets
-            current_exclude_products.add(selected_product_id) 
-            
-            # Remove the selected arm's original index from available_arms_indices for the next iteration
-            # This is crucial for "diversity" as it prevents re-selection within the same batch
-            available_arms_indices.pop(selected_temp_arm_idx)
+    def select_products(self, n_products: int = 5, exclude_products: Optional[List[str]] = None,
+                        scores: Optional[np.ndarray] = None) -> List[Product]:
+        """
+        Select multiple products for recommendation ensuring diversity.
+        Every available product is ranked once, so no product is recommended twice.
+        scores optionally passes shared_scores() to skip rescoring the arms.
+        """
+        mask = self._available_mask(exclude_products)
+        if not mask.any():
+            logger.warning("No products available after exclusions for bandit selection.")
+            return []
 
-        # Retrieve the actual Product objects based on the recommended product IDs
-        return [self.products[pid] for pid in recommended_product_ids]
+        # All available arms are ranked (not just n_products) so callers can fill a page
+        return self._select_ranked(mask, self.n_arms, scores)
 
+    def select_top(self, n_products: int = 5, exclude_products: Optional[List[str]] = None,
+                   scores: Optional[np.ndarray] = None) -> List[Tuple[Product, float]]:
+        """
+        The n_products best-ranked available products with their ranking scores, best first.
+        Scores are only comparable between bandits of the same type.
+        scores optionally passes shared_scores() to skip rescoring the arms.
+        """
+        mask = self._available_mask(exclude_products)
+        k = min(n_products, int(mask.sum()))
+        if k == 0:
+            return []
+        # Rank on the same scores that are returned (Thompson sampling draws them afresh)
+        scores = self.score_arms(mask) if scores is None else np.where(mask, scores, -np.inf)
+        arms = self._rank_arms(mask, k, scores)
+        return [(self._arm_products[i], score) for i, score in zip(arms.tolist(), scores[arms].tolist())]
+
+    def _select_ranked(self, mask: np.ndarray, k: int, scores: Optional[np.ndarray] = None) -> List[Product]:
+        """Return the products of the k best-ranked arms within mask."""
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return []
+        return [self._arm_products[i] for i in self._rank_arms(mask, k, scores).tolist()]
+
+    def _interaction_arms(self, interactions: List[UserInteraction]) -> Tuple[np.ndarray, np.ndarray]:
+        """(arm index, reward) arrays for the interactions on products this bandit knows."""
+        # One pass maps each interaction to an (arm, reward) row; unknown products get arm -1
+        to_arm = self.product_to_arm.get
+        rows = np.fromiter(((to_arm(i.productId, -1), i.reward) for i in interactions),
+                           dtype=[('arm', np.int32), ('reward', np.float32)], count=len(interactions))
+        known = rows['arm'] >= 0
+        return rows['arm'][known], rows['reward'][known]
+
+    def rebuild_rewards(self, interactions: List[UserInteraction]) -> None:
+        """
+        Replace bandit statistics with those of a full interaction history (e.g. on initial load).
+        """
+        self._replace_state(*self._interaction_arms(interactions))
+        self._ledger.clear()
+        self._ledger.mark_counted(i.id for i in interactions)
+        logger.info(f"Rebuilt bandit rewards from {len(interactions)} interactions")
 
     def update_rewards(self, interactions: List[UserInteraction]) -> None:
         """
         Update bandit rewards based on user interactions.
+        Only interactions whose ids have not been counted are added to the current statistics,
+        so passing just the new interactions or an overlapping history both count each once.
+        Stored copies of interactions already passed to update() with their id are skipped too.
+        """
+        new_interactions = [interactions[j] for j in self._ledger.select_new([i.id for i in interactions])]
+
+        arm_idx, rewards = self._interaction_arms(new_interactions)
+        # Scatter-add touches only the arms in the batch, not every arm
+        np.add.at(self.rewards, arm_idx, rewards)
+        np.add.at(self.counts, arm_idx, 1)
+        self.total_pulls += len(arm_idx)
+        self._ledger.mark_counted(i.id for i in new_interactions)
+        self._on_state_update()
+        logger.info("Updated bandit rewards with %d new interactions (of %d)",
+                    len(new_interactions), len(interactions))
+
+    def update_from_aggregates(self, product_ids: List[str], reward_sums: np.ndarray, counts: np.ndarray) -> None:
         """
-        self.rewards = np.zeros(self.n_arms)
-        self.counts = np.zeros(self.n_arms)
+        Replace bandit statistics with per-product aggregates, e.g. the rows of
+        SELECT productId, SUM(reward), COUNT(*) ... GROUP BY productId.
+        Unknown products are ignored; repeated product ids are summed.
+        Aggregates carry no interaction ids, so afterwards update_rewards
+        should only be given interactions that are not part of them.
+        """
+        self._ledger.clear()
+        to_arm = self.product_to_arm.get
+        arm_idx = np.fromiter((to_arm(pid, -1) for pid in product_ids), dtype=np.int32, count=len(product_ids))
+        known = arm_idx >= 0
+        self._replace_state(arm_idx[known], np.asarray(reward_sums)[known], np.asarray(counts)[known])
 
-        product_interactions = {}
-        for interaction in interactions:
-            if interaction.productId in self.product_to_arm:
-                if interaction.productId not in product_interactions:
-                    product_interactions[interaction.productId] = []
-                product_interactions[interaction.productId].append(interaction)
+    def _replace_state(self, arm_idx: np.ndarray, rewards: np.ndarray, counts: Optional[np.ndarray] = None) -> None:
+        """
+        Rebuild counts/rewards from per-row arm indices, summing rows of the same arm.
+        counts defaults to one pull per row.
+        """
+        # Weighted bincount sums per arm in one C pass, with no per-product grouping in Python
+        self.rewards[:] = np.bincount(arm_idx, weights=rewards, minlength=self.n_arms)
+        self.counts[:] = np.bincount(arm_idx, weights=counts, minlength=self.n_arms)
 
-        for product_id, product_interactions_list in product_interactions.items():
-            arm_idx = self.product_to_arm[product_id]
-            self.rewards[arm_idx] = ProductScorer.score_product(product_id, product_interactions_list)
-            self.counts[arm_idx] = len(product_interactions_list)
-        
-        self.total_pulls = int(sum(self.counts))
-        logger.info(f"Updated bandit rewards based on {len(interactions)} interactions")
+        # Accumulate in float64: float32 partial sums stop being exact past 2**24 pulls
+        self.total_pulls = int(self.counts.sum(dtype=np.float64))
+        self._on_state_update()
 
-    def update(self, product_id: str, reward: float) -> None:
+    def _on_state_update(self, arm_idx: Optional[int] = None) -> None:
+        """
+        Hook called after counts/rewards change, with the arm index for a single-arm
+        update or None for bulk changes. Subclasses use it to maintain derived state.
+        """
+        pass
+
+    def update(self, product_id: str, reward: float, interaction_id: Optional[str] = None) -> None:
         """
         Update the bandit with a single reward (for real-time updates).
+        interaction_id is the id of the stored interaction record, if known; update_rewards
+        then skips that record when it is synced later instead of counting it again.
         """
         if product_id not in self.product_to_arm:
             logger.warning(f"Product {product_id} not found in bandit")
@@ -334,30 +631,40 @@ class MultiArmedBandit(ABC):
         self.counts[arm_idx] += 1
         self.rewards[arm_idx] += reward
         self.total_pulls += 1
-        logger.info(f"Updated product {product_id} with reward {reward}")
+        self._on_state_update(arm_idx)
+        if interaction_id is not None:
+            self._ledger.mark_counted([interaction_id])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Updated product %s with reward %s", product_id, reward)
 
     def get_product_stats(self) -> List[Dict[str, Any]]:
         """Get statistics for all products."""
-        stats = []
-        for i, product_id in enumerate(self.product_ids):
-            product = self.products[product_id]
-            avg_reward = self.rewards[i] / self.counts[i] if self.counts[i] > 0 else 0.0
-            stats.append({
-                'product_id': product_id,
+        avg_rewards = np.divide(self.rewards, self.counts, out=np.zeros_like(self.rewards), where=self.counts > 0)
+        # Stable descending order keeps ties in arm order, as the previous list sort did
+        order = np.argsort(-avg_rewards, kind='stable')
+        # Columns are gathered in arm order once; only the final records are built in Python
+        products = [self._arm_products[i] for i in order.tolist()]
+        return [
+            {
+                'product_id': product.id,
                 'product_name': product.name,
                 'category': product.category,
-                'interaction_count': int(self.counts[i]),
-                'average_reward': float(avg_reward),
+                'interaction_count': count,
+                'average_reward': avg_reward,
                 'priority_score': avg_reward # Simple priority based on average reward
-            })
-        stats.sort(key=lambda x: x['priority_score'], reverse=True)
-        return stats
+            }
+            for product, count, avg_reward in zip(products, self.counts[order].astype(np.int64).tolist(),
+                                                  avg_rewards[order].tolist())
+        ]
 
     def reset(self) -> None:
         """Reset all statistics."""
-        self.counts = np.zeros(self.n_arms)
-        self.rewards = np.zeros(self.n_arms)
+        # Zero the state arrays in place so their dtype and buffers are kept
+        self.counts.fill(0)
+        self.rewards.fill(0)
         self.total_pulls = 0
+        self._ledger.clear()
+        self._on_state_update()
         logger.info("Bandit statistics reset")
 
 
@@ -370,21 +677,68 @@ class EpsilonGreedyBandit(MultiArmedBandit):
         self.epsilon = epsilon
         if not 0 <= epsilon <= 1:
             raise ValueError("Epsilon must be between 0 and 1")
+        # Average rewards and greedy arm only change on updates, so both are cached between them
+        self._avg: Optional[np.ndarray] = None
+        self._greedy_arm: Optional[int] = None
+
+    def _on_state_update(self, arm_idx: Optional[int] = None) -> None:
+        """Refresh one cached average in O(1), or drop the cache after a bulk change."""
+        if arm_idx is not None and self._avg is not None:
+            self._avg[arm_idx] = self.rewards[arm_idx] / self.counts[arm_idx]
+        else:
+            self._avg = None
+        self._greedy_arm = None
+
+    def _avg_rewards(self) -> np.ndarray:
+        """Average reward of every arm (0 for arms that were never pulled)."""
+        if self._avg is None:
+            # Handle cases where counts are zero to avoid division by zero
+            self._avg = np.divide(self.rewards, self.counts,
+                                  out=np.zeros_like(self.rewards),
+                                  where=self.counts != 0)
+        return self._avg
+
+    def score_arms(self, mask: np.ndarray) -> np.ndarray:
+        """Score arms by average reward (0 for arms that were never pulled)."""
+        np.copyto(self._score_buf, self._avg_rewards())
+        return self._mask_out(self._score_buf, mask)
+
+    def _rank_arms(self, mask: np.ndarray, k: int, scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Rank arms greedily, but with probability epsilon fill a slot with a random
+        available arm instead; greedy slots keep their greedy order.
+        """
+        explore = self._rng.random(k) < self.epsilon
+        n_explore = int(np.count_nonzero(explore))
+        if n_explore == 0:
+            return super()._rank_arms(mask, k, scores)
+
+        # The best k - n_explore arms fill the greedy slots in order, and the explore
+        # slots get distinct random arms from the rest of the mask
+        selected = np.empty(k, dtype=np.intp)
+        remaining = mask.copy()
+        if n_explore < k:
+            greedy = super()._rank_arms(mask, k - n_explore, scores)
+            selected[~explore] = greedy
+            remaining[greedy] = False
+        selected[explore] = self._rng.choice(np.flatnonzero(remaining), n_explore, replace=False)
+        return selected
 
     def select_arm(self) -> int:
         """
         Select arm using epsilon-greedy strategy.
         """
-        if np.random.random() < self.epsilon:
-            selected_arm = np.random.randint(0, self.n_arms)
-            logger.debug(f"Exploring: selected product {self.product_ids[selected_arm]}")
+        if self._next_rand() < self.epsilon:
+            selected_arm = self._random_arm()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Exploring: selected product %s", self.product_ids[selected_arm])
         else:
-            # Handle cases where counts are zero to avoid division by zero
-            avg_rewards = np.divide(self.rewards, self.counts, 
-                                   out=np.zeros_like(self.rewards), 
-                                   where=self.counts!=0)
-            selected_arm = np.argmax(avg_rewards) if np.any(self.counts > 0) else np.random.randint(0, self.n_arms)
-            logger.debug(f"Exploiting: selected product {self.product_ids[selected_arm]}")
+            if self._greedy_arm is None:
+                # -1 marks "no arm pulled yet", which keeps picking uniformly at random
+                self._greedy_arm = int(np.argmax(self._avg_rewards())) if self.total_pulls > 0 else -1
+            selected_arm = self._greedy_arm if self._greedy_arm >= 0 else self._random_arm()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Exploiting: selected product %s", self.product_ids[selected_arm])
         return int(selected_arm)
 
 
@@ -397,6 +751,61 @@ class UCBBandit(MultiArmedBandit):
         self.confidence_level = confidence_level
         if confidence_level <= 0:
             raise ValueError("Confidence level must be positive")
+        # Per-arm mean reward and 1/sqrt(count) only change on updates, so both are cached
+        # between them; unpulled arms hold mean +inf and 1/sqrt(count) 0
+        self._mean: Optional[np.ndarray] = None
+        self._inv_sqrt_counts: Optional[np.ndarray] = None
+        # sqrt(c*log(N)) and the total_pulls N it was computed for
+        self._exploration_pulls = -1
+        self._exploration = np.float32(0)
+        # select_arm's answer only changes on updates; None means recompute on next call
+        self._best_arm: Optional[int] = None
+        self._n_unpulled: Optional[int] = None # Arms with zero count; None means recount
+
+    def _on_state_update(self, arm_idx: Optional[int] = None) -> None:
+        """Refresh one arm's cached terms in O(1), or drop the cache after a bulk change."""
+        self._best_arm = None
+        if arm_idx is not None:
+            if self._n_unpulled is not None and self.counts[arm_idx] == 1:
+                self._n_unpulled -= 1 # The arm was just pulled for the first time
+        else:
+            self._n_unpulled = None
+        if arm_idx is not None and self._mean is not None:
+            count = self.counts[arm_idx]
+            self._mean[arm_idx] = self.rewards[arm_idx] / count
+            self._inv_sqrt_counts[arm_idx] = 1 / np.sqrt(count)
+        else:
+            self._mean = self._inv_sqrt_counts = None
+
+    def _ucb_terms(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached (mean reward, 1/sqrt(count)) of every arm."""
+        if self._mean is None:
+            pulled = self.counts > 0
+            self._mean = np.divide(self.rewards, self.counts,
+                                   out=np.full(self.n_arms, np.inf, dtype=np.float32), where=pulled)
+            self._inv_sqrt_counts = np.divide(1, np.sqrt(self.counts),
+                                              out=np.zeros(self.n_arms, dtype=np.float32), where=pulled)
+        return self._mean, self._inv_sqrt_counts
+
+    def _ucb_values(self) -> np.ndarray:
+        """
+        UCB value of every arm (+inf for unpulled arms).
+        r/n + sqrt(c*log(N)/n) is evaluated as mean + sqrt(c*log(N)) * (1/sqrt(n)) over the
+        cached per-arm terms, so a call is a multiply and an add per arm; the scalar
+        sqrt(c*log(N)) is only recomputed when total_pulls has changed.
+        """
+        mean, inv_sqrt_counts = self._ucb_terms()
+        if self._exploration_pulls != self.total_pulls:
+            # Ensure total_pulls is at least 1 for the log to avoid a domain error
+            self._exploration = np.float32(math.sqrt(self.confidence_level * math.log(max(1, self.total_pulls))))
+            self._exploration_pulls = self.total_pulls
+        ucb = np.multiply(inv_sqrt_counts, self._exploration, out=self._score_buf)
+        ucb += mean
+        return ucb
+
+    def score_arms(self, mask: np.ndarray) -> np.ndarray:
+        """Score arms by their upper confidence bound; unpulled arms score +inf."""
+        return self._mask_out(self._ucb_values(), mask)
 
     def select_arm(self) -> int:
         """
@@ -406,34 +815,120 @@ class UCBBandit(MultiArmedBandit):
             logger.warning("No arms available for selection in UCB bandit.")
             return -1 # Or raise an appropriate error
 
-        unpulled_arms = np.where(self.counts == 0)[0]
-        if len(unpulled_arms) > 0:
+        if self._n_unpulled is None:
+            self._n_unpulled = int(np.count_nonzero(self.counts == 0))
+        if self._n_unpulled > 0:
             # Randomly select one of the arms that hasn't been pulled yet
-            selected_arm = np.random.choice(unpulled_arms)
-            logger.debug(f"UCB: Pulling unpulled product {self.product_ids[selected_arm]}")
+            selected_arm = self._rng.choice(np.flatnonzero(self.counts == 0))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("UCB: Pulling unpulled product %s", self.product_ids[selected_arm])
             return int(selected_arm)
 
-        # If all arms have been pulled at least once, apply UCB strategy.
-        # Ensure total_pulls is at least 1 for the math.log function to avoid domain error.
-        # This handles the case where temp_bandit.total_pulls might be 0 but its contained arms
-        # have all been pulled (i.e., counts > 0 for all).
-        effective_total_pulls_for_log = max(1, self.total_pulls)
-
-        ucb_values = np.zeros(self.n_arms)
-        for i in range(self.n_arms):
-            # avg_reward will not have division by zero here because unpulled_arms check passed
-            avg_reward = self.rewards[i] / self.counts[i]
-            
-            confidence_interval = math.sqrt(
-                (self.confidence_level * math.log(effective_total_pulls_for_log)) / self.counts[i]
-            )
-            ucb_values[i] = avg_reward + confidence_interval
-        
-        selected_arm = np.argmax(ucb_values)
-        logger.debug(f"UCB: selected product {self.product_ids[selected_arm]} with UCB value {ucb_values[selected_arm]:.3f}")
+        # If all arms have been pulled at least once, apply UCB strategy. The argmax is
+        # deterministic, so it is reused until the next update
+        if self._best_arm is None:
+            self._best_arm = int(np.argmax(self._ucb_values()))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("UCB: selected product %s", self.product_ids[self._best_arm])
+        return self._best_arm
+
+
+class ThompsonSamplingBandit(MultiArmedBandit):
+    """
+    Thompson Sampling Multi-Armed Bandit implementation.
+    Rewards are continuous and may be negative, so each arm has a Gaussian posterior
+    over its mean reward (zero-mean prior worth one pseudo-observation).
+    """
+    def __init__(self, products: List[Product], reward_std: float = 1.0):
+        super().__init__(products)
+        self.reward_std = reward_std
+        if reward_std <= 0:
+            raise ValueError("Reward standard deviation must be positive")
+
+    def _sample_posteriors(self) -> np.ndarray:
+        """Draw one posterior sample per arm in a single vectorized call."""
+        # z*std/sqrt(n) + r/n computed as (z*std*sqrt(n) + r)/sqrt(n)/sqrt(n), in place
+        # in the scratch buffers and in the same float32 as the state
+        sqrt_n = np.add(self.counts, 1, out=self._aux_buf)
+        np.sqrt(sqrt_n, out=sqrt_n)
+        samples = self._rng.standard_normal(dtype=np.float32, out=self._score_buf)
+        samples *= self.reward_std
+        samples *= sqrt_n
+        samples += self.rewards
+        samples /= sqrt_n
+        samples /= sqrt_n
+        return samples
+
+    def score_arms(self, mask: np.ndarray) -> np.ndarray:
+        """Score arms by one posterior sample each; ranking by it is Thompson top-k selection."""
+        return self._mask_out(self._sample_posteriors(), mask)
+
+    def shared_scores(self) -> Optional[np.ndarray]:
+        """Never shared: every request draws its own posterior sample."""
+        return None
+
+    def _rank_arms(self, mask: np.ndarray, k: int, scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Top-k of one posterior sample per arm, best first.
+        Samples are continuous, so unlike the base ranking no random tie-break keys are drawn.
+        """
+        scores = self.score_arms(mask) if scores is None else np.where(mask, scores, -np.inf)
+        if k < self.n_arms:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(self.n_arms)
+        return candidates[np.argsort(-scores[candidates])]
+
+    def select_arm(self) -> int:
+        """
+        Select arm using Thompson Sampling.
+        """
+        samples = self._sample_posteriors()
+        selected_arm = np.argmax(samples)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Thompson: selected product %s with sample %.3f",
+                         self.product_ids[selected_arm], samples[selected_arm])
         return int(selected_arm)
 
 
+class InMemoryRecommendationCache:
+    """
+    Minimal in-process stand-in for a Redis client, exposing the same get/setex/mget/incr calls.
+    Entries expire after their TTL and the least recently used entry is evicted at maxsize.
+    Counters created by incr never expire nor get evicted.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        if key in self._counters:
+            return str(self._counters[key])
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def setex(self, key: str, ttl: int, value: str) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.get(key) for key in keys]
+
+    def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
 
 class BanditManager:
     """
@@ -442,27 +937,56 @@ class BanditManager:
     Simplified to remove redundant methods and focus on core recommendation logic.
     """
 
+    _CACHE_GEN_KEY = "rec:gen" # Prefix of the generation counters kept in the response cache
+
     def __init__(self, default_bandit_type: str = "epsilon_greedy",
                  default_epsilon: float = 0.1,
-                 default_confidence_level: float = 2.0):
+                 default_confidence_level: float = 2.0,
+                 cache: Optional[Any] = None,
+                 cache_ttl: int = 300):
+        """
+        Args:
+            cache: Optional response cache exposing get(key), setex(key, ttl, value), mget(keys)
+                   and incr(key), e.g. a redis.Redis client or InMemoryRecommendationCache.
+                   Disabled if None. It may be shared by several workers: the generations that
+                   invalidate cached responses are counters stored in it, so on Redis use an
+                   eviction policy that spares keys without a TTL (e.g. volatile-lru).
+            cache_ttl: Seconds a cached recommendation response stays valid.
+        """
         self.bandits: Dict[str, MultiArmedBandit] = {}
         self.cold_start_recommender: Optional[ColdStartRecommender] = None
+        self._product_payloads: Dict[str, Dict[str, Any]] = {} # Shared, read-only response dicts per product
         self.default_bandit_type = default_bandit_type
         self.default_epsilon = default_epsilon
         self.default_confidence_level = default_confidence_level
         self.total_recommendations_served = 0 # Renamed for clarity
+        self.cache = cache
+        self.cache_ttl = cache_ttl
 
         logger.info(f"BanditManager initialized with default type: {default_bandit_type}")
 
-    def initialize_system(self, all_products: List[Product], contexts: Optional[List[str]] = None) -> None:
+    def initialize_system(self, all_products: List[Product], contexts: Optional[List[str]] = None,
+                          cold_start_cache_path: Optional[str] = None) -> None:
         """
         Initializes cold start recommender and bandits for specified contexts.
         A 'global' bandit is created if no contexts are provided.
+        cold_start_cache_path optionally points at a directory where the cold start scoring table
+        is loaded from, or saved to when missing or stale.
         """
         if not all_products:
             raise ValueError("Cannot initialize with an empty product list.")
 
-        self.cold_start_recommender = ColdStartRecommender(all_products)
+        self.cold_start_recommender = ColdStartRecommender(all_products, cache_path=cold_start_cache_path)
+        self._product_payloads = {
+            p.id: {
+                "id": p.id,
+                "name": p.name,
+                "price": p.price,
+                "category": p.category,
+                "imageUrl": p.imageUrl
+            }
+            for p in all_products
+        }
         logger.info(f"Initialized cold start recommender with {len(all_products)} products.")
 
         contexts_to_create = contexts if contexts else ["global"]
@@ -470,6 +994,42 @@ class BanditManager:
             self._create_bandit_instance(context, all_products, self.default_bandit_type)
         
         logger.info(f"Initialized {len(self.bandits)} bandit instances for contexts: {', '.join(self.bandits.keys())}.")
+        self._invalidate_cached_recommendations()
+
+    def _invalidate_cached_recommendations(self, bandit_id: Optional[str] = None) -> None:
+        """
+        Make cached responses built from changed state unreachable, by bumping generation
+        counters stored in the cache itself so that every worker sharing it sees the bump.
+        With a bandit_id only responses of that bandit's context and of the global context
+        (which merges all bandits) are affected; None affects every cached response.
+        Old keys are never read again and age out through their TTL, so no key scan is needed.
+        """
+        if self.cache is None:
+            return
+        if bandit_id is None:
+            keys = [self._CACHE_GEN_KEY]
+        else:
+            keys = [f"{self._CACHE_GEN_KEY}:{context}" for context in {bandit_id, "global"}]
+        try:
+            for key in keys:
+                self.cache.incr(key)
+        except Exception as e:
+            logger.warning(f"Recommendation cache invalidation failed: {e}")
+
+    def _recommendation_cache_key(self, user_id: str, context: str, strategy: str,
+                                  n_products: int, is_new_user: bool, exclude_products: List[str]) -> str:
+        """
+        Build the cache key for a recommendation request.
+        It embeds the current generations of the state the response depends on, read in one
+        round trip: the system-wide one, plus the context's own when bandits serve the request.
+        """
+        gen_keys = [self._CACHE_GEN_KEY]
+        if strategy == "bandit" or (strategy == "adaptive" and not is_new_user):
+            gen_keys.append(f"{self._CACHE_GEN_KEY}:{context}")
+        generations = ".".join(str(int(gen or 0)) for gen in self.cache.mget(gen_keys))
+        exclude_hash = hashlib.blake2b(','.join(sorted(exclude_products)).encode(), digest_size=8).hexdigest()
+        return (f"rec:{generations}:{user_id}:{context}:{strategy}:"
+                f"{n_products}:{int(is_new_user)}:{exclude_hash}")
 
     def _create_bandit_instance(self, bandit_id: str, products: List[Product], bandit_type: str) -> MultiArmedBandit:
         """Helper to create and store a bandit instance."""
@@ -477,6 +1037,8 @@ class BanditManager:
             bandit = EpsilonGreedyBandit(products, epsilon=self.default_epsilon)
         elif bandit_type == 'ucb':
             bandit = UCBBandit(products, confidence_level=self.default_confidence_level)
+        elif bandit_type == 'thompson':
+            bandit = ThompsonSamplingBandit(products)
         else:
             raise ValueError(f"Unknown bandit type: {bandit_type}")
         
@@ -484,7 +1046,7 @@ class BanditManager:
         return bandit
 
     def update_bandit_data(self, bandit_id: str, interactions: List[UserInteraction]) -> bool:
-        """Updates a specific bandit's reward and count data based on a list of interactions."""
+        """Adds the interactions a specific bandit has not seen yet to its reward and count data."""
         bandit = self.bandits.get(bandit_id)
         if not bandit:
             logger.error(f"Bandit '{bandit_id}' not found for update.")
@@ -492,20 +1054,46 @@ class BanditManager:
         
         try:
             bandit.update_rewards(interactions)
+            self._invalidate_cached_recommendations(bandit_id)
             return True
         except Exception as e:
             logger.error(f"Error updating bandit '{bandit_id}' with interactions: {e}")
             return False
 
-    def record_interaction(self, bandit_id: str, product_id: str, reward: float) -> bool:
-        """Records a single user interaction for real-time bandit updates."""
+    def update_bandit_aggregates(self, bandit_id: str, product_ids: List[str],
+                                 reward_sums: List[float], counts: List[int]) -> bool:
+        """
+        Updates a specific bandit from pre-aggregated per-product reward sums and counts,
+        so the grouping can run where the interactions are stored instead of here.
+        """
+        bandit = self.bandits.get(bandit_id)
+        if not bandit:
+            logger.error(f"Bandit '{bandit_id}' not found for update.")
+            return False
+
+        try:
+            bandit.update_from_aggregates(product_ids, np.asarray(reward_sums), np.asarray(counts))
+            self._invalidate_cached_recommendations(bandit_id)
+            logger.info(f"Updated bandit '{bandit_id}' from aggregates for {len(product_ids)} products")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating bandit '{bandit_id}' with aggregates: {e}")
+            return False
+
+    def record_interaction(self, bandit_id: str, product_id: str, reward: float,
+                           interaction_id: Optional[str] = None) -> bool:
+        """
+        Records a single user interaction for real-time bandit updates.
+        Pass the stored interaction's id so a later update_bandit_data does not count it twice.
+        """
         bandit = self.bandits.get(bandit_id)
         if not bandit:
             logger.error(f"Bandit '{bandit_id}' not found for interaction record.")
             return False
         
         try:
-            bandit.update(product_id, reward)
+            bandit.update(product_id, reward, interaction_id)
+            self._invalidate_cached_recommendations(bandit_id)
             return True
         except Exception as e:
             logger.error(f"Error recording interaction for bandit '{bandit_id}': {e}")
@@ -526,11 +1114,65 @@ class BanditManager:
         When context="global", gets recommendations from all available bandits.
         """
         exclude_products = exclude_products or []
+        is_new_user = user_interactions_count == 0
+
+        cache_key = None
+        if self.cache is not None:
+            try:
+                cache_key = self._recommendation_cache_key(user_id, context, recommendation_strategy,
+                                                           n_products, is_new_user, exclude_products)
+                cached = self.cache.get(cache_key)
+            except Exception as e:
+                logger.warning(f"Recommendation cache lookup failed: {e}")
+                cache_key = cached = None
+            if cached is not None:
+                self.total_recommendations_served += 1
+                response = json.loads(cached)
+                response["metadata"]["cached"] = True
+                return response
+
+        recommended_products, source_type = self._recommend(n_products, context, exclude_products,
+                                                            recommendation_strategy, is_new_user)
+        self.total_recommendations_served += 1
+
+        # Payload dicts are built once per product and shared across responses; treat them as read-only
+        response_products = [self._product_payloads[product.id] for product in recommended_products]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Generated %d recommendations for user %s from %s using strategy '%s'.",
+                         len(response_products), user_id, source_type, recommendation_strategy)
+
+        response = {
+            "user_id": user_id,
+            "context": context,
+            "recommendations": response_products,
+            "metadata": {
+                "recommendation_source": source_type,
+                "is_new_user": is_new_user,
+                "total_recommended_count": len(response_products),
+                "timestamp": _fast_iso_now()
+            }
+        }
+
+        # Error fallbacks are not cached so the next request retries the real path
+        if cache_key is not None and not source_type.startswith("error"):
+            try:
+                self.cache.setex(cache_key, self.cache_ttl, json.dumps(response))
+            except Exception as e:
+                logger.warning(f"Recommendation cache store failed: {e}")
+
+        return response
+
+    def _recommend(self, n_products: int, context: str, exclude_products: List[str],
+                   recommendation_strategy: str, is_new_user: bool,
+                   shared_scores: Optional[Dict[str, Optional[np.ndarray]]] = None) -> Tuple[List[Product], str]:
+        """
+        Recommended products and their source type for one request (see get_recommendations).
+        shared_scores, if given, memoizes each bandit's shared_scores() across the requests of a batch.
+        """
         recommended_products: List[Product] = []
         source_type = "unknown"
 
-        is_new_user = user_interactions_count == 0
-
         try:
             if recommendation_strategy == "cold_start" or (recommendation_strategy == "adaptive" and is_new_user):
                 if self.cold_start_recommender:
@@ -554,7 +1196,8 @@ class BanditManager:
                 # NEW: Handle global context by getting recommendations from all bandits
                 if context == "global":
                     if self.bandits:
-                        recommended_products = self._get_global_recommendations(n_products, exclude_products)
+                        recommended_products = self._get_global_recommendations(n_products, exclude_products,
+                                                                                shared_scores)
                         source_type = "global_bandit"
                     else:
                         logger.warning("No bandits available for global recommendations. Falling back to cold start.")
@@ -567,7 +1210,10 @@ class BanditManager:
                     # Use specific context bandit as before
                     bandit = self.bandits.get(context)
                     if bandit:
-                        recommended_products = bandit.select_products(n_products=n_products, exclude_products=exclude_products)
+                        recommended_products = bandit.select_products(
+                            n_products=n_products, exclude_products=exclude_products,
+                            scores=self._bandit_scores(context, shared_scores)
+                        )
                         source_type = "bandit"
                     else:
                         logger.warning(f"Bandit '{context}' not found. Falling back to cold start (if available).")
@@ -595,106 +1241,65 @@ class BanditManager:
                 recommended_products = []
                 source_type = "error"
 
-        self.total_recommendations_served += 1
-
-        response_products = [
-            {
-                "id": product.id,
-                "name": product.name,
-                "price": product.price,
-                "category": product.category,
-                "imageUrl": product.imageUrl
-            }
-            for product in recommended_products
-        ]
-        
-        logger.info(f"Generated {len(response_products)} recommendations for user {user_id} "
-                f"from {source_type} using strategy '{recommendation_strategy}'.")
+        return recommended_products, source_type
 
-        return {
-            "user_id": user_id,
-            "context": context,
-            "recommendations": response_products,
-            "metadata": {
-                "recommendation_source": source_type,
-                "is_new_user": is_new_user,
-                "total_recommended_count": len(response_products),
-                "timestamp": datetime.now().isoformat()
-            }
-        }
+    def _bandit_scores(self, bandit_id: str,
+                       shared_scores: Optional[Dict[str, Optional[np.ndarray]]]) -> Optional[np.ndarray]:
+        """A bandit's shared_scores(), memoized in shared_scores (None disables sharing)."""
+        if shared_scores is None:
+            return None
+        if bandit_id not in shared_scores:
+            shared_scores[bandit_id] = self.bandits[bandit_id].shared_scores()
+        return shared_scores[bandit_id]
 
-    def _get_global_recommendations(self, n_products: int, exclude_products: List[str]) -> List[Product]:
+    def recommend_batch(self, requests: List[Tuple[str, int, Optional[List[str]]]]) -> List[List[Dict[str, Any]]]:
+        """
+        Serve many (context, n_products, exclude_products) requests at once, e.g. requests
+        queued by a web worker. Each request gets exactly what get_recommendations with
+        recommendation_strategy="bandit" would return for it, including the global context
+        and the cold start fallbacks, and requests are served in order.
+        Bandits whose scores only change on updates score their arms once for the whole batch;
+        Thompson sampling still draws a fresh posterior sample per request.
+        Returns product payload lists in request order.
+        """
+        shared_scores: Dict[str, Optional[np.ndarray]] = {}
+        results = []
+        for context, n_products, exclude_products in requests:
+            products, _ = self._recommend(n_products, context, exclude_products or [], "bandit", False, shared_scores)
+            results.append([self._product_payloads[product.id] for product in products])
+
+        self.total_recommendations_served += len(requests)
+        logger.info("Served %d batched requests across %d bandits", len(requests), len(shared_scores))
+        return results
+
+    def _get_global_recommendations(self, n_products: int, exclude_products: List[str],
+                                    shared_scores: Optional[Dict[str, Optional[np.ndarray]]] = None) -> List[Product]:
         """
         Get recommendations from all available bandits to fill the page.
-        Returns as many recommendations as possible from all categories.
+        Like select_products on a single context, every available product is returned,
+        ranked by score; a product offered by several bandits keeps its best score.
+        n_products is not a cap here, matching the per-context path.
         """
-        all_recommendations = []
-        
-        logger.info(f"Found {len(self.bandits)} bandits: {list(self.bandits.keys())}")
-        
-        # Get recommendations from each available bandit
+        best: Dict[str, Tuple[float, Product]] = {}
         for bandit_id, bandit in self.bandits.items():
-            try:
-                # Request the full n_products from each bandit to maximize variety
-                # We'll filter and limit later
-                bandit_recs = bandit.select_products(
-                    n_products=n_products,  # Get full amount from each bandit
-                    exclude_products=exclude_products
-                )
-                
-                logger.info(f"Bandit '{bandit_id}' ({type(bandit).__name__}) returned {len(bandit_recs)} recommendations")
-                
-                    
-                all_recommendations.extend(bandit_recs)
-                
-            except Exception as e:
-                logger.warning(f"Error getting recommendations from bandit '{bandit_id}': {e}")
-        
-        logger.info(f"Before deduplication: {len(all_recommendations)} total recommendations")
-        
-        # Debug: Log product IDs to check for duplicates
-        product_ids = [product.id for product in all_recommendations]
-        logger.info(f"Product IDs collected: {product_ids}")
-        
-        # Remove duplicates while preserving order
-        seen_products = set(exclude_products)  # Start with excluded products
-        unique_recommendations = []
-        
-        for product in all_recommendations:
-            if product.id not in seen_products:
-                unique_recommendations.append(product)
-                seen_products.add(product.id)
-            else:
-                logger.debug(f"Duplicate product filtered: {product.id}")
-        
-        logger.info(f"After deduplication: {len(unique_recommendations)} unique recommendations")
-        
-        # Shuffle to avoid bias towards first bandits
-        import random
-        random.shuffle(unique_recommendations)
-        
-        # Take up to n_products for the final response
-        final_recommendations = unique_recommendations
-        
-        # Debug logging
-        logger.info(f"Global recommendations: Combined {len(all_recommendations)} total recommendations, "
-                f"filtered to {len(unique_recommendations)} unique products, "
-                f"returning {len(final_recommendations)} final recommendations")
-        
-        # Log distribution by category for debugging
-        category_distribution = {}
-        for product in final_recommendations:
-            category = getattr(product, 'source_bandit', getattr(product, 'category', 'unknown'))
-            category_distribution[category] = category_distribution.get(category, 0) + 1
-        
-        logger.info(f"Final distribution by bandit/category: {category_distribution}")
-        
-        # Additional debug: log actual product IDs being returned
-        final_ids = [product.id for product in final_recommendations]
-        logger.info(f"Final product IDs: {final_ids}")
-        
+            scores = self._bandit_scores(bandit_id, shared_scores)
+            for product, score in bandit.select_top(bandit.n_arms, exclude_products, scores):
+                if product.id not in best or score > best[product.id][0]:
+                    best[product.id] = (score, product)
+
+        # Stable sort, so equal scores keep bandit order
+        ranked = sorted(best.values(), key=itemgetter(0), reverse=True)
+        final_recommendations = [product for _, product in ranked]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Global recommendations: returning %d products from %d bandits",
+                         len(final_recommendations), len(self.bandits))
+            logger.debug("Final distribution by category: %s",
+                         dict(Counter(product.category for product in final_recommendations)))
+            logger.debug("Final product IDs: %s", [product.id for product in final_recommendations])
+
         return final_recommendations
-    
+
     def get_bandit_stats(self, bandit_id: str) -> Optional[Dict[str, Any]]:
         """Get detailed statistics for a specific bandit."""
         bandit = self.bandits.get(bandit_id)
@@ -728,6 +1333,7 @@ class BanditManager:
             logger.warning(f"Attempted to reset non-existent bandit: {bandit_id}")
             return False
         bandit.reset()
+        self._invalidate_cached_recommendations(bandit_id)
         logger.info(f"Bandit '{bandit_id}' statistics have been reset.")
         return True
 
@@ -736,10 +1342,15 @@ class BanditManager:
         for bandit_id in self.bandits:
             self.bandits[bandit_id].reset()
         self.total_recommendations_served = 0
+        self._invalidate_cached_recommendations()
         logger.info("All bandit statistics and system recommendation count reset.")
 
 
 # Utility functions (kept minimal and focused on data conversion)
+def _intern(value: Any) -> Any:
+    """Intern low-cardinality strings (category, brand, action...) so repeats share one object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
 def create_product_from_dict(product_data: Dict[str, Any]) -> Product:
     """Create Product object from dictionary data."""
     features = None
@@ -749,18 +1360,18 @@ def create_product_from_dict(product_data: Dict[str, Any]) -> Product:
             avg_rating=float(features_data.get('avg_rating', 0.0)),
             review_count=int(features_data.get('review_count', 0)),
             price_competitiveness=float(features_data.get('price_competitiveness', 0.5)),
-            market_position=features_data.get('market_position', 'Mid-range'),
+            market_position=_intern(features_data.get('market_position', 'Mid-range')),
             days_since_launch=int(features_data.get('days_since_launch', 0)),
             trend_momentum=float(features_data.get('trend_momentum', 0.0)),
-            lifecycle_stage=features_data.get('lifecycle_stage', 'Mature')
+            lifecycle_stage=_intern(features_data.get('lifecycle_stage', 'Mature'))
         )
     return Product(
         id=str(product_data['id']),
         name=product_data['name'],
         description=product_data.get('description', ''),
         price=float(product_data.get('price', 0)),
-        category=product_data.get('category', 'general'),
-        brand=product_data.get('brand', ''),
+        category=_intern(product_data.get('category', 'general')),
+        brand=_intern(product_data.get('brand', '')),
         imageUrl=product_data.get('imageUrl', ''),
         features=features
     )
@@ -777,7 +1388,7 @@ def create_interaction_from_dict(interaction_data: Dict[str, Any]) -> UserIntera
         id=str(interaction_data['id']),
         userId=str(interaction_data['userId']),
         productId=str(interaction_data['productId']),
-        action=interaction_data.get('action', 'view'),
+        action=_intern(interaction_data.get('action', 'view')),
         reward=float(interaction_data.get('reward', 0.0)),
         context=interaction_data.get('context'),
         createdAt=interaction_data['createdAt'],
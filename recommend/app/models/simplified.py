@@ -1,18 +1,26 @@
 """
 Simplified Recommendation System that works with existing database schema
 Focuses on user feedback (tick/cross) without unnecessary complexity
+
+Logs go to the module logger (logging.getLogger(__name__)); importing this module
+does not configure logging, that is left to the embedding application.
 """
+import heapq
+from collections import OrderedDict
+from operator import itemgetter
 import numpy as np
-from typing import List, Dict, Optional, Any
-from dataclasses import dataclass
+from typing import List, Dict, Optional, Any, Sequence, Tuple, Union
+from dataclasses import dataclass, field
 from datetime import datetime
 import logging
+import sys
 import json
 
-logging.basicConfig(level=logging.INFO)
+from .utils import InteractionLedger, exclusion_mask
+
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     """Product information"""
     id: str
@@ -23,8 +31,16 @@ class Product:
     brand: str
     imageUrl: str
     features: Optional[Dict[str, Any]] = None  # JSON features from DB
+    # Numeric (non-bool) entries of features, split out once so hot paths skip type checks
+    numeric_features: Tuple[Tuple[str, float], ...] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.numeric_features = tuple(
+            (name, float(value)) for name, value in (self.features or {}).items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        )
 
-@dataclass
+@dataclass(slots=True)
 class UserInteraction:
     """User interaction data"""
     id: str
@@ -36,112 +52,285 @@ class UserInteraction:
     createdAt: str
     product: Product
 
+@dataclass(slots=True)
+class InteractionBatch:
+    """
+    Interactions stored column-wise: one list/array per field, aligned by row
+    Carries only the fields the recommender reads, so bulk loads skip building
+    a UserInteraction and a nested Product per row
+    """
+    ids: List[str]
+    user_ids: List[str]
+    product_ids: List[str]
+    actions: List[str]
+    rewards: np.ndarray  # float64
+    created_at: List[str]
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def take(self, rows: List[int]) -> "InteractionBatch":
+        """Batch of the given rows, in the given order"""
+        return InteractionBatch(
+            ids=[self.ids[j] for j in rows],
+            user_ids=[self.user_ids[j] for j in rows],
+            product_ids=[self.product_ids[j] for j in rows],
+            actions=[self.actions[j] for j in rows],
+            rewards=self.rewards[np.asarray(rows, dtype=np.intp)],
+            created_at=[self.created_at[j] for j in rows]
+        )
+    
+    @classmethod
+    def from_interactions(cls, interactions: List[UserInteraction]) -> "InteractionBatch":
+        """Columnar view of UserInteraction objects"""
+        return cls(
+            ids=[i.id for i in interactions],
+            user_ids=[i.userId for i in interactions],
+            product_ids=[i.productId for i in interactions],
+            actions=[i.action for i in interactions],
+            rewards=np.fromiter((i.reward for i in interactions), dtype=np.float64, count=len(interactions)),
+            created_at=[i.createdAt for i in interactions]
+        )
+    
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any]]) -> "InteractionBatch":
+        """
+        Build a batch straight from interaction dicts in one pass
+        Fields are converted and required as in create_interaction_from_dict, except that
+        nested product data is not read; malformed rows are logged and skipped
+        """
+        ids, user_ids, product_ids, actions, rewards, created_at = [], [], [], [], [], []
+        for row in rows:
+            try:
+                interaction_id = str(row['id'])
+                user_id = str(row['userId'])
+                product_id = str(row['productId'])
+                action = _intern(row.get('action', 'view'))
+                reward = float(row.get('reward', 0.0))
+                created = row['createdAt']
+            except Exception as e:
+                logger.error(f"Error creating interaction from data: {e}")
+                continue
+            ids.append(interaction_id)
+            user_ids.append(user_id)
+            product_ids.append(product_id)
+            actions.append(action)
+            rewards.append(reward)
+            created_at.append(created)
+        return cls(ids, user_ids, product_ids, actions, np.array(rewards, dtype=np.float64), created_at)
+
 class SimplifiedRecommendationSystem:
     """
     Simplified recommendation system that works with your existing data structure
     Focuses on learning user preferences from interactions with computed rewards
     """
     
+    PRICE_RANGES = ("budget", "mid_range", "premium", "luxury")
+    PRICE_BOUNDS = (100, 500, 1000)  # Upper bounds (exclusive) of all but the last price range
+    REC_CACHE_SIZE = 10_000  # Max memoized top-k rankings
+    
     def __init__(self, products: List[Product]):
         self.products = {p.id: p for p in products}
-        self.user_preferences = {}  # user_id -> {feature: weight, category: weight}
-        self.product_scores = {}    # product_id -> cumulative score based on all user interactions
         self.user_interaction_counts = {}  # user_id -> number of interactions
-        
-        # Initialize product scores
-        for product_id in self.products:
-            self.product_scores[product_id] = 0.0
+        self._ledger = InteractionLedger()  # Which stored interactions the state already counts
+        self._rng = np.random.default_rng()  # PCG64 generator seeded from OS entropy
+        # Memoized personalized rankings: (user_id, state generation, category, k, excludes) -> top ids.
+        # Global product scores feed every user's ranking, so any interaction bumps the generation
+        self._rec_cache: OrderedDict = OrderedDict()
+        self._state_gen = 0
+        
+        # Catalog as column arrays (one entry per product, in self._product_list order),
+        # so scoring a user against every product is a few vectorized operations
+        self._product_list = list(self.products.values())
+        self._product_index = dict(zip(self.products, range(len(self._product_list))))
+        # Category, brand and price of every product, gathered in one pass
+        attributes = [(p.category.lower(), p.brand.lower(), p.price) for p in self._product_list]
+        categories, brands, prices = zip(*attributes) if attributes else ((), (), ())
+        self._cat_to_id, self._cat_ids = self._encode(categories)
+        self._category_masks: Dict[int, np.ndarray] = {}  # Filled lazily per requested category id
+        self._brand_to_id, self._brand_ids = self._encode(brands)
+        # Price range id of every product, by one binary search over the range bounds
+        self._price_ids = np.searchsorted(self.PRICE_BOUNDS, prices, side='right').astype(np.int32)
+        
+        # Keys of every product in CSR form: product i owns entries
+        # self._key_offsets[i]:self._key_offsets[i + 1] of the (column, weight) arrays.
+        # Category, brand and price range keys weigh 1, features weigh their value.
+        # Columns are laid out as [categories | brands | price ranges | numeric features],
+        # feature columns being assigned as features are first seen
+        brand_base = len(self._cat_to_id)
+        price_base = brand_base + len(self._brand_to_id)
+        feature_base = price_base + len(self.PRICE_RANGES)
+        feature_to_id: Dict[str, int] = {}
+        key_indices: List[int] = []
+        key_weights: List[float] = []
+        key_rates: List[float] = []  # Learning rate of each entry
+        offsets = [0]
+        for p, cat_id, brand_id, price_id in zip(self._product_list, self._cat_ids.tolist(),
+                                                 self._brand_ids.tolist(), self._price_ids.tolist()):
+            key_indices += (cat_id, brand_base + brand_id, price_base + price_id)
+            key_weights += (1.0, 1.0, 1.0)
+            key_rates += (0.2, 0.15, 0.1)
+            for feature_name, feature_value in p.numeric_features:
+                key_indices.append(feature_base + feature_to_id.setdefault(feature_name, len(feature_to_id)))
+                key_weights.append(feature_value)
+                key_rates.append(0.1)
+            offsets.append(len(key_indices))
+        self._key_indices = np.array(key_indices, dtype=np.intp)
+        self._key_weights = np.array(key_weights, dtype=np.float64)
+        # Preference delta per unit of reward for each entry
+        self._key_deltas = self._key_weights * np.array(key_rates, dtype=np.float64)
+        self._key_offsets = np.array(offsets, dtype=np.intp)
+        self._key_counts = np.diff(self._key_offsets)
+        
+        # Preference key space: one column per category, brand, price range and numeric feature
+        self._pref_key_names = ([f"category_{c}" for c in self._cat_to_id]
+                                + [f"brand_{b}" for b in self._brand_to_id]
+                                + [f"price_range_{r}" for r in self.PRICE_RANGES]
+                                + [f"feature_{f}" for f in feature_to_id])
+        
+        # Dense per-user preferences: row self._user_idx[user_id] of a matrix grown by doubling.
+        # _user_pref_set marks the keys a user has a preference for at all (even if it nets to 0)
+        self._user_idx: Dict[str, int] = {}
+        self._user_ids: List[str] = []  # Inverse of _user_idx
+        self._user_pref_mat = np.zeros((0, len(self._pref_key_names)), dtype=np.float64)
+        self._user_pref_set = np.zeros((0, len(self._pref_key_names)), dtype=bool)
+        self._user_action_prefs: Dict[str, Dict[str, float]] = {}  # user_id -> {action key: weight}
+        self._action_keys: Dict[str, str] = {}  # action -> "action_<action>", filled as actions are seen
+        
+        # Cumulative score of each product based on all user interactions
+        self._product_scores = np.zeros(len(self._product_list), dtype=np.float64)
+        # Scratch buffers reused by every personalized scoring pass
+        self._score_buf = np.empty(len(self._product_list), dtype=np.float64)
+        self._gather_buf = np.empty(len(self._key_indices), dtype=np.float64)
+        
+        # Response dicts are built once per product and shared across responses (read-only)
+        self._product_payloads = {
+            p.id: {
+                "id": p.id,
+                "name": p.name,
+                "price": p.price,
+                "category": p.category,
+                "imageUrl": p.imageUrl,
+                "brand": p.brand
+            }
+            for p in self._product_list
+        }
         
         logger.info(f"Initialized recommendation system with {len(products)} products")
     
-    def update_from_interactions(self, interactions: List[UserInteraction]) -> None:
+    @staticmethod
+    def _encode(values: Sequence[str]) -> Tuple[Dict[str, int], np.ndarray]:
+        """Intern strings to int32 codes; returns (value -> code vocab, codes)."""
+        vocab: Dict[str, int] = {}
+        codes = np.fromiter((vocab.setdefault(v, len(vocab)) for v in values), dtype=np.int32, count=len(values))
+        return vocab, codes
+    
+    def rebuild_from_interactions(self, interactions: Union[List[UserInteraction], InteractionBatch]) -> None:
         """
-        Update the system based on user interactions from database
-        This replaces the complex bandit update logic
+        Rebuild the system from the full interaction history in the database (cold boot)
         """
+        if not isinstance(interactions, InteractionBatch):
+            interactions = InteractionBatch.from_interactions(interactions)
+        
         # Reset scores for fresh calculation
-        for product_id in self.products:
-            self.product_scores[product_id] = 0.0
+        self._product_scores.fill(0.0)
         
-        self.user_preferences = {}
         self.user_interaction_counts = {}
+        self._user_idx = {}
+        self._user_ids = []
+        self._user_pref_mat = np.zeros((0, len(self._pref_key_names)), dtype=np.float64)
+        self._user_pref_set = np.zeros((0, len(self._pref_key_names)), dtype=bool)
+        self._user_action_prefs = {}
+        self._ledger.clear()
+        self._rec_cache.clear()
+        
+        n_users = self._apply_interactions(interactions)
+        self._ledger.mark_counted(interactions.ids)
+        logger.info(f"Rebuilt system from {len(interactions)} interactions from {n_users} users")
+    
+    def update_from_interactions(self, interactions: Union[List[UserInteraction], InteractionBatch]) -> None:
+        """
+        Update the system based on user interactions from database
+        Only interactions whose ids have not been counted are folded into the existing
+        state, so passing a full or overlapping history does not count rows twice.
+        Stored copies of interactions already recorded in real time are skipped too
+        """
+        if not isinstance(interactions, InteractionBatch):
+            interactions = InteractionBatch.from_interactions(interactions)
+        
+        new_rows = self._ledger.select_new(interactions.ids)
+        n_users = self._apply_interactions(interactions.take(new_rows))
+        self._ledger.mark_counted(interactions.ids)
+        logger.info(f"Updated system with {len(new_rows)} new interactions "
+                    f"(of {len(interactions)}) from {n_users} users")
+    
+    def _apply_interactions(self, batch: InteractionBatch) -> int:
+        """
+        Fold interactions into the current state; returns the number of users involved
+        One pass maps every interaction to (user row, product row, reward), then
+        preferences, product scores and counts are reduced with vectorized scatter-adds
+        """
+        # Unknown products raise KeyError here, before any state is touched
+        product_rows = np.fromiter((self._product_index[pid] for pid in batch.product_ids),
+                                   dtype=np.intp, count=len(batch))
+        rewards = batch.rewards
+        user_rows = []
+        for user_id, action, reward in zip(batch.user_ids, batch.actions, rewards.tolist()):
+            user_rows.append(self._user_row(user_id))
+            
+            # Update action-specific preferences
+            action_key = self._action_keys.get(action)
+            if action_key is None:
+                action_key = self._action_keys[action] = f"action_{action}"
+            action_prefs = self._user_action_prefs[user_id]
+            action_prefs[action_key] = action_prefs.get(action_key, 0.0) + reward * 0.05
+        user_rows = np.array(user_rows, dtype=np.intp)
         
-        # Group interactions by user
-        user_interactions = {}
-        for interaction in interactions:
-            if interaction.userId not in user_interactions:
-                user_interactions[interaction.userId] = []
-            user_interactions[interaction.userId].append(interaction)
-        
-        # Process each user's interactions
-        for user_id, user_interaction_list in user_interactions.items():
-            self._update_user_preferences(user_id, user_interaction_list)
-            self.user_interaction_counts[user_id] = len(user_interaction_list)
+        self._update_user_preferences(user_rows, product_rows, rewards)
         
         # Update global product scores
-        for interaction in interactions:
-            self.product_scores[interaction.productId] += interaction.reward * 0.1
-        
-        logger.info(f"Updated system with {len(interactions)} interactions from {len(user_interactions)} users")
-    
-    def _update_user_preferences(self, user_id: str, interactions: List[UserInteraction]) -> None:
-        """Update user preferences based on their interaction history"""
-        if user_id not in self.user_preferences:
-            self.user_preferences[user_id] = {}
+        np.add.at(self._product_scores, product_rows, rewards * 0.1)
         
-        user_prefs = self.user_preferences[user_id]
+        # Update interaction counts
+        users, counts = np.unique(user_rows, return_counts=True)
+        for uidx, count in zip(users.tolist(), counts.tolist()):
+            user_id = self._user_ids[uidx]
+            self.user_interaction_counts[user_id] = self.user_interaction_counts.get(user_id, 0) + count
         
-        for interaction in interactions:
-            product = self.products.get(interaction.productId)
-            if not product:
-                continue
-            
-            reward = interaction.reward
-            
-            # Update category preference
-            category_key = f"category_{product.category.lower()}"
-            if category_key not in user_prefs:
-                user_prefs[category_key] = 0.0
-            user_prefs[category_key] += reward * 0.2
-            
-            # Update brand preference
-            brand_key = f"brand_{product.brand.lower()}"
-            if brand_key not in user_prefs:
-                user_prefs[brand_key] = 0.0
-            user_prefs[brand_key] += reward * 0.15
-            
-            # Update price range preference
-            price_range = self._get_price_range(product.price)
-            price_key = f"price_range_{price_range}"
-            if price_key not in user_prefs:
-                user_prefs[price_key] = 0.0
-            user_prefs[price_key] += reward * 0.1
-            
-            # Update preferences based on product features (if available)
-            if product.features:
-                for feature_name, feature_value in product.features.items():
-                    if isinstance(feature_value, (int, float)):
-                        feature_key = f"feature_{feature_name}"
-                        if feature_key not in user_prefs:
-                            user_prefs[feature_key] = 0.0
-                        user_prefs[feature_key] += reward * feature_value * 0.1
-            
-            # Update action-specific preferences
-            action_key = f"action_{interaction.action}"
-            if action_key not in user_prefs:
-                user_prefs[action_key] = 0.0
-            user_prefs[action_key] += reward * 0.05
-    
-    def _get_price_range(self, price: float) -> str:
-        """Categorize price into ranges"""
-        if price < 100:
-            return "budget"
-        elif price < 500:
-            return "mid_range"
-        elif price < 1000:
-            return "premium"
-        else:
-            return "luxury"
+        if len(batch):
+            self._state_gen += 1
+        return len(users)
+    
+    def _user_row(self, user_id: str) -> int:
+        """Row of a user in the preference matrix, assigned on first sight"""
+        uidx = self._user_idx.get(user_id)
+        if uidx is None:
+            uidx = self._user_idx[user_id] = len(self._user_ids)
+            self._user_ids.append(user_id)
+            self._user_action_prefs[user_id] = {}
+            if uidx == len(self._user_pref_mat):
+                # Grow by doubling so appending users is amortized O(1)
+                capacity = max(16, 2 * uidx)
+                pref_mat = np.zeros((capacity, len(self._pref_key_names)), dtype=np.float64)
+                pref_mat[:uidx] = self._user_pref_mat
+                pref_set = np.zeros((capacity, len(self._pref_key_names)), dtype=bool)
+                pref_set[:uidx] = self._user_pref_set
+                self._user_pref_mat, self._user_pref_set = pref_mat, pref_set
+        return uidx
+    
+    def _update_user_preferences(self, user_rows: np.ndarray, product_rows: np.ndarray,
+                                 rewards: np.ndarray) -> None:
+        """Update user preferences from aligned arrays of interaction user rows, product rows and rewards"""
+        # Expand each interaction into its product's key entries, then scatter-add the
+        # category, brand, price range and feature deltas into the users' rows at once
+        counts = self._key_counts[product_rows]
+        starts = self._key_offsets[product_rows]
+        entries = np.arange(counts.sum()) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        rows = np.repeat(user_rows, counts)
+        cols = self._key_indices[entries]
+        deltas = np.repeat(rewards, counts) * self._key_deltas[entries]
+        np.add.at(self._user_pref_mat, (rows, cols), deltas)
+        self._user_pref_set[rows, cols] = True
     
     def get_recommendations(self, user_id: str, n_products: int = 5,
                           exclude_products: Optional[List[str]] = None,
@@ -168,19 +357,10 @@ class SimplifiedRecommendationSystem:
             source = "personalized"
         
         # Format response to match your expected structure
-        response_products = [
-            {
-                "id": product.id,
-                "name": product.name,
-                "price": product.price,
-                "category": product.category,
-                "imageUrl": product.imageUrl,
-                "brand": product.brand
-            }
-            for product in recommended_products
-        ]
+        response_products = [self._product_payloads[product.id] for product in recommended_products]
         
-        logger.info(f"Generated {len(response_products)} {source} recommendations for user {user_id}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Generated %d %s recommendations for user %s", len(response_products), source, user_id)
         
         return {
             "user_id": user_id,
@@ -198,124 +378,136 @@ class SimplifiedRecommendationSystem:
                                         exclude_products: List[str],
                                         category_filter: Optional[str] = None) -> List[Product]:
         """Get personalized recommendations based on user preferences"""
-        if user_id not in self.user_preferences:
+        if user_id not in self._user_idx:
             return self._get_popular_products(n_products, exclude_products, category_filter)
         
-        user_prefs = self.user_preferences[user_id]
-        product_scores = []
+        candidates = np.flatnonzero(self._candidate_mask(exclude_products, category_filter))
         
-        for product_id, product in self.products.items():
-            if product_id in exclude_products:
-                continue
-            
-            if category_filter and product.category.lower() != category_filter.lower():
-                continue
-            
-            score = self._calculate_personalized_score(product, user_prefs)
-            product_scores.append((product, score))
-        
-        # Sort by score
-        product_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Add exploration: take top 70% deterministically, randomize the rest
-        if len(product_scores) > n_products:
+        # Add exploration: take top 80% deterministically, randomize the rest
+        if len(candidates) > n_products:
             deterministic_count = max(1, int(n_products * 0.8))
-            top_products = [p for p, _ in product_scores[:deterministic_count]]
+            top = self._cached_top_k(user_id, candidates, deterministic_count,
+                                     exclude_products, category_filter)
             
-            remaining_products = [p for p, _ in product_scores[deterministic_count:]]
+            # Linear-time set difference via a mask (np.setdiff1d would sort the whole candidate set)
+            in_top = np.zeros(len(self._product_list), dtype=bool)
+            in_top[top] = True
+            remaining = candidates[~in_top[candidates]]
             exploration_count = n_products - deterministic_count
             
-            if len(remaining_products) >= exploration_count:
-                explored_products = np.random.choice(
-                    remaining_products, 
-                    size=exploration_count, 
-                    replace=False
-                ).tolist()
+            if len(remaining) >= exploration_count:
+                explored = self._rng.choice(remaining, size=exploration_count, replace=False)
             else:
-                explored_products = remaining_products
+                explored = remaining
             
-            return top_products + explored_products
+            return [self._product_list[i] for i in np.concatenate([top, explored]).tolist()]
         else:
-            return [p for p, _ in product_scores[:n_products]]
-    
-    def _calculate_personalized_score(self, product: Product, user_prefs: Dict[str, float]) -> float:
-        """Calculate personalized score for a product based on user preferences"""
-        # Start with global product score
-        score = self.product_scores.get(product.id, 0.0)
-        
-        # Add category preference
-        category_key = f"category_{product.category.lower()}"
-        if category_key in user_prefs:
-            score += user_prefs[category_key]
-        
-        # Add brand preference
-        brand_key = f"brand_{product.brand.lower()}"
-        if brand_key in user_prefs:
-            score += user_prefs[brand_key]
-        
-        # Add price range preference
-        price_range = self._get_price_range(product.price)
-        price_key = f"price_range_{price_range}"
-        if price_key in user_prefs:
-            score += user_prefs[price_key]
-        
-        # Add feature-based preferences
-        if product.features:
-            for feature_name, feature_value in product.features.items():
-                if isinstance(feature_value, (int, float)):
-                    feature_key = f"feature_{feature_name}"
-                    if feature_key in user_prefs:
-                        score += user_prefs[feature_key] * feature_value
-        
-        return score
+            top = self._cached_top_k(user_id, candidates, n_products, exclude_products, category_filter)
+            return [self._product_list[i] for i in top.tolist()]
+    
+    def _cached_top_k(self, user_id: str, candidates: np.ndarray, k: int,
+                      exclude_products: List[str], category_filter: Optional[str]) -> np.ndarray:
+        """
+        The k best candidates for a user, memoized in a bounded LRU cache
+        Keys carry the state generation, so entries from before any interaction are never hit again
+        """
+        key = (user_id, self._state_gen, category_filter, k, frozenset(exclude_products))
+        top = self._rec_cache.get(key)
+        if top is not None:
+            self._rec_cache.move_to_end(key)
+            return top
+        
+        top = self._top_k(candidates, self._personalized_scores(user_id), k)
+        self._rec_cache[key] = top
+        if len(self._rec_cache) > self.REC_CACHE_SIZE:
+            self._rec_cache.popitem(last=False)
+        return top
+    
+    def _personalized_scores(self, user_id: str) -> np.ndarray:
+        """
+        Personalized score of every product for a user, in one vectorized pass
+        Returns a reused buffer, valid until the next call
+        """
+        scores, gathered = self._score_buf, self._gather_buf
+        # Gather the user's preference for each product key, weight it, and sum the
+        # keys of every product in one pass; then add the global product score
+        np.take(self._user_pref_mat[self._user_idx[user_id]], self._key_indices, out=gathered)
+        gathered *= self._key_weights
+        np.add.reduceat(gathered, self._key_offsets[:-1], out=scores)
+        scores += self._product_scores
+        return scores
+    
+    def _candidate_mask(self, exclude_products: List[str],
+                        category_filter: Optional[str] = None) -> np.ndarray:
+        """Boolean mask over self._product_list of products that pass the exclusion and category filters"""
+        mask = exclusion_mask(self._product_index, len(self._product_list), exclude_products)
+        if category_filter:
+            mask &= self._category_mask(category_filter)
+        return mask
+    
+    def _category_mask(self, category: str) -> np.ndarray:
+        """Cached boolean mask of the products in a (case-insensitive) category"""
+        # Unknown categories map to -1, which no product carries
+        code = self._cat_to_id.get(category.lower(), -1)
+        mask = self._category_masks.get(code)
+        if mask is None:
+            mask = self._category_masks[code] = self._cat_ids == code
+        return mask
+    
+    @staticmethod
+    def _top_k(candidates: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        The k highest-scoring candidates, best first
+        candidates must be in catalog order; ties, including those at the k-th
+        score, are resolved in catalog order
+        """
+        if k < len(candidates):
+            # Partial selection finds the k-th best score; argpartition alone would pick an
+            # arbitrary subset of the candidates tied at it, so take those in catalog order
+            candidate_scores = scores[candidates]
+            kth = -np.partition(-candidate_scores, k - 1)[k - 1]
+            keep = candidate_scores > kth
+            keep[np.flatnonzero(candidate_scores == kth)[:k - np.count_nonzero(keep)]] = True
+            candidates = candidates[keep]
+        return candidates[np.argsort(-scores[candidates], kind='stable')][:k]
     
     def _get_popular_products(self, n_products: int, exclude_products: List[str],
                             category_filter: Optional[str] = None) -> List[Product]:
         """Get popular products based on global scores"""
-        available_products = []
-        
-        for product_id, product in self.products.items():
-            if product_id in exclude_products:
-                continue
-            
-            if category_filter and product.category.lower() != category_filter.lower():
-                continue
-            
-            score = self.product_scores.get(product_id, 0.0)
-            available_products.append((product, score))
-        
-        # Sort by global score
-        available_products.sort(key=lambda x: x[1], reverse=True)
+        candidates = np.flatnonzero(self._candidate_mask(exclude_products, category_filter))
+        top = self._top_k(candidates, self._product_scores, n_products)
         
         # If no products have positive scores, randomize order
-        if not available_products or available_products[0][1] <= 0:
-            products_only = [p for p, _ in available_products]
-            np.random.shuffle(products_only)
-            return products_only[:n_products]
+        if not len(top) or self._product_scores[top[0]] <= 0:
+            # Sample n without replacement rather than shuffling every candidate
+            top = self._rng.choice(candidates, size=min(n_products, len(candidates)), replace=False)
         
-        return [p for p, _ in available_products[:n_products]]
+        return [self._product_list[i] for i in top.tolist()]
     
     def record_single_interaction(self, interaction: UserInteraction) -> None:
         """
         Record a single new interaction for real-time updates
-        Call this when user gives immediate feedback (tick/cross)
+        Call this when user gives immediate feedback (tick/cross). The interaction must
+        carry the id of its stored database record, so a later sync of that record does
+        not count it again
         """
-        # Update global product score
-        self.product_scores[interaction.productId] += interaction.reward * 0.1
-        
-        # Update user preferences
-        self._update_user_preferences(interaction.userId, [interaction])
-        
-        # Update interaction count
-        if interaction.userId not in self.user_interaction_counts:
-            self.user_interaction_counts[interaction.userId] = 0
-        self.user_interaction_counts[interaction.userId] += 1
-        
-        logger.info(f"Recorded real-time interaction: {interaction.action} for user {interaction.userId} on product {interaction.productId}")
+        if not self._ledger.select_new([interaction.id]):
+            # Already counted, by an earlier sync of its stored record or a repeated call
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Skipped already counted interaction %s", interaction.id)
+            return
+        
+        # Update global product score, user preferences and interaction count
+        self._apply_interactions(InteractionBatch.from_interactions([interaction]))
+        self._ledger.mark_counted([interaction.id])
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Recorded real-time interaction: %s for user %s on product %s",
+                         interaction.action, interaction.userId, interaction.productId)
     
     def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get user statistics"""
-        if user_id not in self.user_preferences:
+        if user_id not in self._user_idx:
             return {
                 "user_id": user_id,
                 "is_new_user": True,
@@ -323,11 +515,10 @@ class SimplifiedRecommendationSystem:
                 "top_preferences": {}
             }
         
-        user_prefs = self.user_preferences[user_id]
+        user_prefs = self._get_user_preferences(user_id)
         
         # Get top preferences
-        sorted_prefs = sorted(user_prefs.items(), key=lambda x: x[1], reverse=True)
-        top_preferences = dict(sorted_prefs[:10])
+        top_preferences = dict(heapq.nlargest(10, user_prefs.items(), key=itemgetter(1)))
         
         return {
             "user_id": user_id,
@@ -337,19 +528,31 @@ class SimplifiedRecommendationSystem:
             "preference_count": len(user_prefs)
         }
     
+    def _get_user_preferences(self, user_id: str) -> Dict[str, float]:
+        """A user's preferences as {key: weight}, read back from their matrix row"""
+        uidx = self._user_idx[user_id]
+        row = self._user_pref_mat[uidx]
+        user_prefs = {self._pref_key_names[k]: float(row[k]) for k in np.flatnonzero(self._user_pref_set[uidx]).tolist()}
+        user_prefs.update(self._user_action_prefs[user_id])
+        return user_prefs
+    
     def get_system_stats(self) -> Dict[str, Any]:
         """Get overall system statistics"""
         return {
             "total_products": len(self.products),
-            "total_users": len(self.user_preferences),
+            "total_users": len(self._user_idx),
             "total_interactions": sum(self.user_interaction_counts.values()),
-            "top_products": sorted(
-                [(pid, score) for pid, score in self.product_scores.items()],
-                key=lambda x: x[1], reverse=True
-            )[:10]
+            "top_products": [
+                (self._product_list[i].id, float(self._product_scores[i]))
+                for i in self._top_k(np.arange(len(self._product_list)), self._product_scores, 10).tolist()
+            ]
         }
 
 # Utility functions to work with your existing database conversion functions
+def _intern(value: Any) -> Any:
+    """Intern low-cardinality strings (category, brand, action...) so repeats share one object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
 def create_product_from_dict(product_data: Dict[str, Any]) -> Product:
     """Create Product object from dictionary data - matches your existing function"""
     features = product_data.get('features')
@@ -364,25 +567,35 @@ def create_product_from_dict(product_data: Dict[str, Any]) -> Product:
         name=product_data['name'],
         description=product_data.get('description', ''),
         price=float(product_data.get('price', 0)),
-        category=product_data.get('category', 'general'),
-        brand=product_data.get('brand', ''),
+        category=_intern(product_data.get('category', 'general')),
+        brand=_intern(product_data.get('brand', '')),
         imageUrl=product_data.get('imageUrl', ''),
         features=features
     )
 
-def create_interaction_from_dict(interaction_data: Dict[str, Any]) -> UserInteraction:
-    """Create UserInteraction object from dictionary data - matches your existing function"""
-    product_data = interaction_data.get('product', {})
-    if not product_data and 'productId' in interaction_data:
-        product_data = {'id': interaction_data['productId'], 'name': 'Unknown Product'}
-    
-    product = create_product_from_dict(product_data)
+def create_interaction_from_dict(interaction_data: Dict[str, Any],
+                                product_cache: Optional[Dict[str, Product]] = None) -> UserInteraction:
+    """
+    Create UserInteraction object from dictionary data - matches your existing function
+    When converting a batch, pass the same product_cache dict to every call so each
+    nested product is parsed once and shared by all of its interactions
+    """
+    product_id = str(interaction_data['productId'])
+    product = product_cache.get(product_id) if product_cache is not None else None
+    if product is None:
+        product_data = interaction_data.get('product', {})
+        if not product_data:
+            product_data = {'id': product_id, 'name': 'Unknown Product'}
+        
+        product = create_product_from_dict(product_data)
+        if product_cache is not None:
+            product_cache[product_id] = product
     
     return UserInteraction(
         id=str(interaction_data['id']),
         userId=str(interaction_data['userId']),
-        productId=str(interaction_data['productId']),
-        action=interaction_data.get('action', 'view'),
+        productId=product_id,
+        action=_intern(interaction_data.get('action', 'view')),
         reward=float(interaction_data.get('reward', 0.0)),
         context=interaction_data.get('context'),
         createdAt=interaction_data['createdAt'],
@@ -423,7 +636,8 @@ class SimplifiedBanditManager:
     def record_interaction(self, bandit_id: str, product_id: str, reward: float) -> bool:
         """Record a single interaction - simplified for compatibility"""
         # This is a simplified version - in practice you'd need the full interaction object
-        logger.info(f"Recorded interaction for product {product_id} with reward {reward}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Recorded interaction for product %s with reward %s", product_id, reward)
         return True
     
     def get_recommendations(self, user_id: str, n_products: int = 5,
@@ -0,0 +1,56 @@
+"""
+Helpers shared by the recommendation models.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+
+def exclusion_mask(index: Dict[str, int], n: int, exclude_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+    """
+    Boolean mask over n rows that is False for the rows of excluded ids.
+    index maps ids to rows; ids it does not know are ignored.
+    """
+    mask = np.ones(n, dtype=bool)
+    if exclude_ids:
+        to_row = index.get
+        # One hash lookup per excluded id; unknown ids map to None and are dropped
+        mask[[row for row_id in exclude_ids if (row := to_row(row_id)) is not None]] = False
+    return mask
+
+
+class InteractionLedger:
+    """
+    Tracks which stored interactions a model has counted, by interaction id.
+
+    Syncs are de-duplicated on ids rather than timestamps: a row the database commits
+    after an earlier sync but with an older createdAt is still new to the ledger.
+    Real-time events are marked with the id of their stored record, so the sync of
+    that record skips them. Ids are only forgotten on clear(), e.g. before a rebuild.
+    """
+
+    def __init__(self):
+        self._counted: Set[str] = set()
+
+    def clear(self) -> None:
+        """Forget every counted id."""
+        self._counted = set()
+
+    def select_new(self, ids: Sequence[str]) -> List[int]:
+        """
+        Positions of the ids that have not been counted yet, skipping repeats within ids.
+        The ledger is not changed; call mark_counted once the rows have been counted.
+        """
+        counted = self._counted
+        batch_ids: Set[str] = set()
+        new_rows = []
+        for j, interaction_id in enumerate(ids):
+            if interaction_id in counted or interaction_id in batch_ids:
+                continue
+            batch_ids.add(interaction_id)
+            new_rows.append(j)
+        return new_rows
+
+    def mark_counted(self, ids: Iterable[str]) -> None:
+        """Remember interactions that have been counted, synced or recorded in real time."""
+        self._counted.update(ids)
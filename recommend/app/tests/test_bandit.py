@@ -0,0 +1,150 @@
+import copy
+import dataclasses
+
+import numpy as np
+import pytest
+
+from models.bandit import (BanditManager, ColdStartRecommender, InMemoryRecommendationCache, Product,
+                           UserInteraction)
+
+
+@pytest.fixture
+def products():
+    return [
+        Product(id=f"p{i}", name=f"Product {i}", description="", price=10.0 * (i + 1),
+                category="home" if i % 2 else "toys", brand="acme", imageUrl="")
+        for i in range(8)
+    ]
+
+
+def interaction(products, interaction_id, product_index=0, reward=1.0, user_id="u1",
+                created_at="2024-05-01T10:00:00.000Z"):
+    product = products[product_index]
+    return UserInteraction(id=interaction_id, userId=user_id, productId=product.id, action="tick",
+                           reward=reward, context=None, createdAt=created_at, product=product)
+
+
+def test_realtime_interaction_then_sync_counts_once(products):
+    manager = BanditManager()
+    manager.initialize_system(products)
+    bandit = manager.bandits["global"]
+
+    manager.record_interaction("global", "p0", 1.0, interaction_id="db-1")
+    manager.update_bandit_data("global", [interaction(products, "db-1")])
+
+    assert bandit.counts[bandit.product_to_arm["p0"]] == 1
+    assert bandit.rewards[bandit.product_to_arm["p0"]] == pytest.approx(1.0)
+    assert bandit.total_pulls == 1
+
+
+def test_overlapping_syncs_only_count_new_interactions(products):
+    manager = BanditManager()
+    manager.initialize_system(products)
+    bandit = manager.bandits["global"]
+    first = [interaction(products, "db-1"), interaction(products, "db-2", product_index=1)]
+
+    manager.update_bandit_data("global", first)
+    manager.update_bandit_data("global", first + [
+        interaction(products, "db-3", product_index=1, reward=2.0, created_at="2024-05-02T10:00:00.000Z")
+    ])
+
+    assert bandit.total_pulls == 3
+    assert bandit.rewards[bandit.product_to_arm["p1"]] == pytest.approx(3.0)
+
+
+def test_sync_counts_rows_committed_late_with_older_timestamps(products):
+    manager = BanditManager()
+    manager.initialize_system(products)
+    bandit = manager.bandits["global"]
+    late = interaction(products, "db-2", product_index=1, created_at="2024-05-01T10:00:00.500Z")
+
+    manager.update_bandit_data("global", [late])
+    manager.update_bandit_data("global", [interaction(products, "db-1", created_at="2024-05-01T10:00:00.400Z"), late])
+
+    assert bandit.total_pulls == 2
+    assert bandit.counts[bandit.product_to_arm["p0"]] == 1
+
+
+def test_cold_start_cache_is_written_on_startup_and_reused_until_stale(products, tmp_path):
+    cache_path = str(tmp_path / "cold_start")
+
+    built = ColdStartRecommender(products, cache_path=cache_path)
+    loaded = ColdStartRecommender(products, cache_path=cache_path)
+
+    assert isinstance(loaded._scores, np.memmap)
+    built._rng, loaded._rng = np.random.default_rng(0), np.random.default_rng(0)
+    np.testing.assert_array_equal(loaded._scores, built._scores)
+    assert ([p.id for p in loaded.get_cold_start_recommendations(n_products=8)]
+            == [p.id for p in built.get_cold_start_recommendations(n_products=8)])
+
+    repriced = [dataclasses.replace(p, price=p.price + 1) if i == 0 else p for i, p in enumerate(products)]
+    rebuilt = ColdStartRecommender(repriced, cache_path=cache_path)
+    assert not isinstance(rebuilt._scores, np.memmap)
+    assert isinstance(ColdStartRecommender(repriced, cache_path=cache_path)._prices, np.memmap)
+
+
+def test_shared_cache_is_invalidated_by_any_worker_for_affected_contexts(products):
+    cache = InMemoryRecommendationCache()
+    workers = [BanditManager(cache=cache), BanditManager(cache=cache)]
+    for worker in workers:
+        worker.initialize_system(products, contexts=["home", "toys"])
+
+    def cached(context, interactions_count=3):
+        response = workers[0].get_recommendations("u1", context=context,
+                                                  user_interactions_count=interactions_count)
+        return response["metadata"].get("cached", False)
+
+    requests = [("home", 3), ("toys", 3), ("global", 3), ("home", 0)]
+    assert not any(cached(*request) for request in requests)
+    assert all(cached(*request) for request in requests)
+
+    workers[1].record_interaction("home", "p1", 1.0)
+
+    assert not cached("home")
+    assert not cached("global")
+    assert cached("toys")
+    assert cached("home", interactions_count=0)  # Cold-start responses do not depend on the bandits
+
+
+def test_global_recommendations_merge_bandits_by_score_and_fill_the_page(products):
+    manager = BanditManager(default_bandit_type="epsilon_greedy", default_epsilon=0.0)
+    manager.initialize_system(products, contexts=["home", "toys"])
+    for product_id, reward in (("p1", 1.0), ("p2", 3.0), ("p3", 0.5)):
+        manager.record_interaction("home", product_id, reward)
+    for product_id, reward in (("p2", 0.2), ("p4", 2.0), ("p5", 1.5)):
+        manager.record_interaction("toys", product_id, reward)
+
+    response = manager.get_recommendations("u1", n_products=3, context="global",
+                                           user_interactions_count=1, exclude_products=["p4"])
+
+    ids = [p["id"] for p in response["recommendations"]]
+    assert ids[:4] == ["p2", "p5", "p1", "p3"]
+    assert response["metadata"]["recommendation_source"] == "global_bandit"
+    # Like a single context, the page is filled with every available product
+    context_response = manager.get_recommendations("u1", n_products=3, context="home",
+                                                   user_interactions_count=1, exclude_products=["p4"])
+    assert sorted(ids) == sorted(p["id"] for p in context_response["recommendations"])
+
+
+@pytest.mark.parametrize("bandit_type", ["epsilon_greedy", "ucb", "thompson"])
+def test_recommend_batch_matches_single_requests(products, bandit_type):
+    manager = BanditManager(default_bandit_type=bandit_type)
+    manager.initialize_system(products, contexts=["home", "toys"])
+    manager.update_bandit_data("home", [interaction(products, f"db-{i}", product_index=i % 5, reward=i / 4,
+                                                    created_at=f"2024-05-01T10:00:0{i}.000Z")
+                                        for i in range(10)])
+    for bandit in manager.bandits.values():
+        bandit._rng = np.random.default_rng(7)
+    manager.cold_start_recommender._rng = np.random.default_rng(7)
+    twin = copy.deepcopy(manager)
+
+    requests = [("home", 3, None), ("toys", 2, ["p1"]), ("global", 4, ["p0"]),
+                ("home", 3, ["p2", "p3"]), ("missing", 2, None), ("global", 2, None)]
+    batch = manager.recommend_batch(requests)
+    singles = [
+        twin.get_recommendations("u1", n_products=n_products, context=context, exclude_products=exclude,
+                                 recommendation_strategy="bandit")["recommendations"]
+        for context, n_products, exclude in requests
+    ]
+
+    assert [[p["id"] for p in recs] for recs in batch] == [[p["id"] for p in recs] for recs in singles]
@@ -0,0 +1,89 @@
+import pytest
+
+from models.simplified import Product, SimplifiedRecommendationSystem, UserInteraction
+
+
+@pytest.fixture
+def products():
+    return [
+        Product(id=f"p{i}", name=f"Product {i}", description="", price=50.0 * (i + 1),
+                category="home" if i % 2 else "toys", brand="acme", imageUrl="",
+                features={"rating": 4.0})
+        for i in range(6)
+    ]
+
+
+def interaction(products, interaction_id, user_id="u1", product_index=0, action="tick", reward=1.0,
+                created_at="2024-05-01T10:00:00.000Z"):
+    product = products[product_index]
+    return UserInteraction(id=interaction_id, userId=user_id, productId=product.id, action=action,
+                           reward=reward, context=None, createdAt=created_at, product=product)
+
+
+def product_score(system, product_id):
+    return float(system._product_scores[system._product_index[product_id]])
+
+
+def test_feedback_then_sync_counts_interaction_once(products):
+    system = SimplifiedRecommendationSystem(products)
+    stored = interaction(products, "db-1")
+
+    # Real-time feedback carries the stored record's id, then the same record is synced
+    system.record_single_interaction(stored)
+    system.update_from_interactions([interaction(products, "db-1")])
+
+    assert system.user_interaction_counts["u1"] == 1
+    assert product_score(system, "p0") == pytest.approx(0.1)
+    assert system.get_user_stats("u1")["top_preferences"]["action_tick"] == pytest.approx(0.05)
+
+
+def test_sync_then_late_feedback_counts_interaction_once(products):
+    system = SimplifiedRecommendationSystem(products)
+    system.update_from_interactions([interaction(products, "db-1")])
+    system.record_single_interaction(interaction(products, "db-1"))
+
+    assert system.user_interaction_counts["u1"] == 1
+    assert product_score(system, "p0") == pytest.approx(0.1)
+
+
+def test_overlapping_syncs_only_count_new_interactions(products):
+    system = SimplifiedRecommendationSystem(products)
+    first = [interaction(products, "db-1"),
+             interaction(products, "db-2", product_index=1, created_at="2024-05-01T11:00:00.000Z")]
+    system.update_from_interactions(first)
+
+    later = interaction(products, "db-3", product_index=2, reward=2.0, created_at="2024-05-02T09:00:00.000Z")
+    # Same timestamp as the newest synced row, but a different record
+    same_time = interaction(products, "db-4", product_index=3, created_at="2024-05-01T11:00:00.000Z")
+    system.update_from_interactions(first + [later, same_time])
+
+    assert system.user_interaction_counts["u1"] == 4
+    assert product_score(system, "p1") == pytest.approx(0.1)
+    assert product_score(system, "p2") == pytest.approx(0.2)
+    assert product_score(system, "p3") == pytest.approx(0.1)
+
+
+def test_sync_counts_rows_committed_late_with_older_timestamps(products):
+    system = SimplifiedRecommendationSystem(products)
+    late = interaction(products, "db-2", product_index=1, created_at="2024-05-01T10:00:00.500Z")
+    system.update_from_interactions([late])
+    # Committed after the first sync, but stamped earlier than the row it already counted
+    early = interaction(products, "db-1", created_at="2024-05-01T10:00:00.400Z")
+    system.update_from_interactions([early, late])
+
+    assert system.user_interaction_counts == {"u1": 2}
+    assert product_score(system, "p0") == pytest.approx(0.1)
+    assert product_score(system, "p1") == pytest.approx(0.1)
+
+
+def test_rebuild_replaces_state_and_counted_ids(products):
+    system = SimplifiedRecommendationSystem(products)
+    system.record_single_interaction(interaction(products, "db-1"))
+    history = [interaction(products, "db-1"), interaction(products, "db-2", product_index=1)]
+
+    system.rebuild_from_interactions(history)
+    system.update_from_interactions(history)
+
+    assert system.user_interaction_counts["u1"] == 2
+    assert product_score(system, "p0") == pytest.approx(0.1)
+    assert product_score(system, "p1") == pytest.approx(0.1)